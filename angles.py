@@ -0,0 +1,118 @@
+"""
+Joint angles for single frames and for recorded stacks.
+
+A live frame is MediaPipe's list of 33 landmark objects (or anything with
+.x/.y/.z/.visibility, like Landmark below). The per-frame code reads only the
+few landmarks an exercise needs and uses math.atan2 on them; copying the whole
+skeleton into NumPy first costs more than the angles themselves. Recordings
+and offline jobs use (T, 33, 4) arrays of (x, y, z, visibility), where
+AngleEngine computes every angle of every frame in one vectorized pass.
+"""
+import math
+from collections import namedtuple
+
+import numpy as np
+
+NUM_LANDMARKS = 33
+
+# MediaPipe PoseLandmark indices (kept here so offline jobs don't need mediapipe)
+NOSE = 0
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_ELBOW, RIGHT_ELBOW = 13, 14
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+LEFT_HIP, RIGHT_HIP = 23, 24
+LEFT_KNEE, RIGHT_KNEE = 25, 26
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+
+# Column layout of a landmark row
+X, Y, Z, VISIBILITY = 0, 1, 2, 3
+
+Landmark = namedtuple('Landmark', ['x', 'y', 'z', 'visibility'])
+
+# Named joints as (first, mid, end) landmark triplets; the angle is measured at `mid`
+JOINTS = {
+    'left_knee': (LEFT_HIP, LEFT_KNEE, LEFT_ANKLE),
+    'right_knee': (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE),
+    'left_elbow': (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST),
+    'right_elbow': (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST),
+    'left_hip': (LEFT_SHOULDER, LEFT_HIP, LEFT_KNEE),
+    'right_hip': (RIGHT_SHOULDER, RIGHT_HIP, RIGHT_KNEE),
+    'left_shoulder': (LEFT_HIP, LEFT_SHOULDER, LEFT_ELBOW),
+    'right_shoulder': (RIGHT_HIP, RIGHT_SHOULDER, RIGHT_ELBOW),
+    'left_body': (LEFT_SHOULDER, LEFT_HIP, LEFT_ANKLE),
+    'right_body': (RIGHT_SHOULDER, RIGHT_HIP, RIGHT_ANKLE),
+}
+
+
+def landmarks_to_array(landmarks, out=None) -> np.ndarray:
+    """
+    Copies MediaPipe landmarks into a (33, 4) float32 array of (x, y, z, visibility).
+    Pass a preallocated `out` array to reuse the same buffer every frame.
+    """
+    if out is None:
+        out = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+    # Scalar stores through a memoryview avoid building a list of tuples for NumPy to parse
+    flat = memoryview(out).cast('B').cast('f')
+    k = 0
+    for lm in landmarks:
+        flat[k] = lm.x; flat[k + 1] = lm.y; flat[k + 2] = lm.z; flat[k + 3] = lm.visibility
+        k += 4
+    return out
+
+
+def array_to_landmarks(pts) -> list:
+    """
+    The inverse of landmarks_to_array: a list of Landmark tuples for a (33, 4) array.
+    """
+    return [Landmark(*row) for row in pts.tolist()]
+
+
+def joint_angle(a, b, c) -> float:
+    """
+    Angle in degrees at landmark `b`, from three landmark objects.
+    """
+    angle = abs(math.degrees(math.atan2(c.y - b.y, c.x - b.x) - math.atan2(a.y - b.y, a.x - b.x)))
+    return 360.0 - angle if angle > 180.0 else angle
+
+
+def calculate_angle(a, b, c):
+    """
+    Angle in degrees at `b` for three 2D points. Kept for one-off callers;
+    per-frame code should use joint_angle and stacks AngleEngine.
+    """
+    radians = np.arctan2(c[1]-b[1], c[0]-b[0]) - np.arctan2(a[1]-b[1], a[0]-b[0])
+    angle = np.abs(radians*180.0/np.pi)
+    return 360 - angle if angle > 180.0 else angle
+
+
+class AngleEngine:
+    """
+    Computes a fixed set of named joint angles for a stack of frames
+    (T, 33, 4), or one (33, 4) frame, with a single vectorized pass.
+    """
+
+    def __init__(self, joints=None):
+        names = tuple(joints) if joints is not None else tuple(JOINTS)
+        triplets = np.array([JOINTS[name] for name in names], dtype=np.intp)
+        self.names = names
+        self.index = {name: i for i, name in enumerate(names)}
+        self._a, self._b, self._c = triplets[:, 0], triplets[:, 1], triplets[:, 2]
+
+    def __call__(self, points: np.ndarray) -> np.ndarray:
+        """
+        Returns angles in degrees with shape (..., len(self.names)).
+        """
+        xy = points[..., :2]
+        b = xy[..., self._b, :]
+        ba = xy[..., self._a, :] - b
+        bc = xy[..., self._c, :] - b
+        radians = np.arctan2(bc[..., 1], bc[..., 0]) - np.arctan2(ba[..., 1], ba[..., 0])
+        angle = np.abs(np.degrees(radians))
+        return np.where(angle > 180.0, 360.0 - angle, angle)
+
+    def as_dict(self, points: np.ndarray) -> dict:
+        """
+        Same as calling the engine, but keyed by joint name.
+        """
+        angles = self(points)
+        return {name: angles[..., i] for i, name in enumerate(self.names)}
@@ -1,13 +1,19 @@
 import streamlit as st
-import cv2
 import mediapipe as mp
-import numpy as np
 import time
-import os
-from gtts import gTTS
-from playsound import playsound
+import math
+import contextlib
 import planner 
-import ollama
+import pipeline
+import exercises
+import audio
+import recording
+import render
+import roi
+import resources
+import history
+import stations
+from telemetry import METRICS
 from datetime import datetime
 
 # --- PAGE CONFIG & INITIALIZATION ---
@@ -18,43 +24,65 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-client = ollama.Client(host='http://127.0.0.1:11434')
-
 # --- HELPER FUNCTIONS ---
-def calculate_angle(a, b, c):
-    a, b, c = np.array(a), np.array(b), np.array(c)
-    radians = np.arctan2(c[1]-b[1], c[0]-b[0]) - np.arctan2(a[1]-b[1], a[0]-b[0])
-    angle = np.abs(radians*180.0/np.pi)
-    return 360 - angle if angle > 180.0 else angle
+@st.cache_resource
+def warm_model():
+    # Load the model once per server process so the first plan doesn't pay for it
+    return planner.warm_up()
 
-def speak(text, filename="speech.mp3"):
-    try:
-        if os.path.exists(filename): os.remove(filename)
-        tts = gTTS(text=text, lang='en', slow=False)
-        tts.save(filename)
-        playsound(filename, block=False)
-    except Exception as e:
-        print(f"Error in speak function: {e}")
-
-def get_ai_motivation(goal, exercise, progress, set_num, total_sets):
-    prompt = f"""
-    The user's goal is to '{goal}'.
-    They just finished set {set_num} of {total_sets}, completing {progress} of {exercise}.
-    Write one short, powerful, encouraging sentence that connects this specific achievement to their main goal.
-    Sound like an enthusiastic gym buddy. Don't be generic.
-    """
-    try:
-        response = client.chat(model='gemma:2b', messages=[{'role': 'user', 'content': prompt}])
-        return response['message']['content']
-    except Exception as e:
-        print(f"AI Motivation Error: {e}")
-        return "Great work! Keep pushing."
+@st.cache_resource
+def get_history():
+    return history.HistoryStore()
+
+@st.cache_resource
+def get_voice():
+    # One player per process; rep numbers and stock phrases are pre-rendered in the background
+    voice = audio.VoicePlayer()
+    voice.prerender(audio.STOCK_PHRASES)
+    return voice
+
+def speak(text):
+    get_voice().say(text)
+
+def pose_resource():
+    mp_pose = mp.solutions.pose
+    if st.session_state.roi_tracking:
+        return resources.pose('roi', lambda: roi.RoiPoseEstimator(lambda complexity, static_image_mode: mp_pose.Pose(static_image_mode=static_image_mode, model_complexity=complexity, min_detection_confidence=0.5, min_tracking_confidence=0.5)))
+    return resources.pose('default', lambda: mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5))
+
+def prewarm_tracking():
+    resources.camera(0).prewarm()
+    pose_resource().prewarm()
+
+@st.cache_resource
+def station_registry():
+    # Station processes belong to the server process, not to a browser session
+    return {}
+
+def get_stations(sources, exercise):
+    registry = station_registry()
+    key = (tuple(sources), exercise)
+    if registry.get('key') != key:
+        if registry.get('supervisor') is not None:
+            registry['supervisor'].stop()
+        registry['supervisor'] = stations.StationSupervisor(sources, exercise) if sources else None
+        registry['key'] = key
+        if sources:
+            registry['supervisor'].start()
+    return registry['supervisor']
+
+def plan_phrases(plan):
+    first = plan[0]
+    phrases = [f"Starting workout. First up: {first['target']} {first['type']} of {first['exercise']}."]
+    phrases += [f"Rest over. Next up: {ex['target']} {ex['type']} of {ex['exercise']}." for ex in plan[1:]]
+    return phrases
 
 def initialize_state():
     st.session_state.page = 'welcome'
     st.session_state.goal = ''
     st.session_state.plan = None
     st.session_state.nutrition_tip = None
+    st.session_state.llm_futures = {}
     st.session_state.current_exercise_index = 0
     st.session_state.counter = 0
     st.session_state.stage = None
@@ -64,6 +92,9 @@ def initialize_state():
     st.session_state.timer_started = False
     st.session_state.last_time = 0.0
     st.session_state.user_ready = False
+    st.session_state.rest_until = None
+    st.session_state.workout_id = f"{datetime.now():%Y%m%d-%H%M%S}"
+    st.session_state.set_started_at = None
 
 # Initialize state for the first run
 if 'page' not in st.session_state:
@@ -71,9 +102,14 @@ if 'page' not in st.session_state:
     st.session_state.age = 25
     st.session_state.weight = 70.0
     st.session_state.height = 175.0
-    st.session_state.steps = 0
-    st.session_state.water = 0
-    st.session_state.workout_history = []
+    st.session_state.user_name = history.DEFAULT_USER
+    st.session_state.history_cursors = [None]
+    st.session_state.pipelined = True
+    st.session_state.record_landmarks = False
+    st.session_state.roi_tracking = False
+    st.session_state.recording_path = f"recordings/session-{datetime.now():%Y%m%d-%H%M%S}{recording.EXTENSION}"
+
+warm_model()
 
 # --- SIDEBAR FOR NAVIGATION ---
 with st.sidebar:
@@ -81,9 +117,18 @@ with st.sidebar:
     if st.button("💪 Start New Workout"):
         initialize_state()
         st.rerun()
+    st.session_state.user_name = st.text_input("👤 Your name", value=st.session_state.user_name, help="Workouts and habits are saved on this device under this name.").strip() or history.DEFAULT_USER
     if st.button("📊 Daily Dashboard"):
         st.session_state.page = 'dashboard'
+        st.session_state.history_cursors = [None]
+        st.rerun()
+    if st.button("🏟️ Gym Stations"):
+        st.session_state.page = 'stations'
         st.rerun()
+    st.session_state.pipelined = st.toggle("⚡ Pipelined camera mode", value=st.session_state.pipelined, help="Capture, pose tracking and display run in parallel and always use the newest camera frame.")
+    st.session_state.roi_tracking = st.toggle("🎯 Focus on me (faster tracking)", value=st.session_state.roi_tracking, help="Track only the area around you and pick the pose model size that keeps up on this device.")
+    st.session_state.record_landmarks = st.toggle("🎥 Record landmarks", value=st.session_state.record_landmarks, help="Save the tracked skeleton (not video) so sessions can be re-scored later.")
+    METRICS.enabled = st.toggle("📈 Performance telemetry", value=METRICS.enabled, help=f"Show per-stage timings on the video and write them to {METRICS.export_path}.")
 
 # --- ======================== UI & LOGIC ======================== ---
 
@@ -92,28 +137,113 @@ if st.session_state.page == 'dashboard':
     st.write("Log your daily progress and see your completed workouts!")
     st.divider()
 
+    store, user = get_history(), st.session_state.user_name
+
+    st.subheader("📅 This Week")
+    week = store.week(user)
+    col_workouts, col_sets, col_reps, col_days = st.columns(4)
+    col_workouts.metric("Workouts", week.workouts)
+    col_sets.metric("Sets", week.sets)
+    col_reps.metric("Reps", week.reps)
+    col_days.metric("Active days", week.active_days)
+    recent_days = store.daily(user, days=14)
+    if recent_days:
+        st.bar_chart({"Reps": {day.period: day.reps for day in recent_days}})
+    st.divider()
+
     st.subheader("🗓️ Your Workout History")
-    if not st.session_state.workout_history:
+    # Keyset pagination: one page of sets per render, however long the history is
+    page_size = 20
+    cursors = st.session_state.history_cursors
+    page = store.recent_sets(user, limit=page_size + 1, before_id=cursors[-1])
+    has_older = len(page) > page_size
+    page = page[:page_size]
+    if not page:
         st.info("You haven't completed any workouts yet. Go crush one!")
-    else:
-        for entry in reversed(st.session_state.workout_history):
-            st.success(entry, icon="✅")
+    for entry in page:
+        done = f"{entry.reps} reps" if entry.kind == 'reps' else f"{entry.seconds:.0f} seconds"
+        st.success(f"{datetime.fromtimestamp(entry.finished_at):%B %d, %Y %H:%M}: {entry.exercise}, {done} (target {entry.target} {entry.kind}) for your goal: '{entry.goal}'.", icon="✅")
+    col_newer, col_older = st.columns(2)
+    if len(cursors) > 1 and col_newer.button("⬅️ Newer", use_container_width=True):
+        cursors.pop()
+        st.rerun()
+    if has_older and col_older.button("Older ➡️", use_container_width=True):
+        cursors.append(page[-1].id)
+        st.rerun()
     st.divider()
-    
+
+    water, steps = store.habits(user)
     st.subheader("💧 Water Intake")
     water_goal = 2500
-    st.session_state.water = st.number_input("Log your water intake (ml)", value=st.session_state.water, step=250, min_value=0)
-    st.progress(st.session_state.water / water_goal if water_goal > 0 else 0)
-    st.write(f"{st.session_state.water} / {water_goal} ml")
+    water = st.number_input("Log your water intake (ml)", value=water, step=250, min_value=0)
+    st.progress(min(water / water_goal, 1.0) if water_goal > 0 else 0)
+    st.write(f"{water} / {water_goal} ml")
     st.divider()
     
     st.subheader("👟 Daily Steps")
     step_goal = 10000
-    st.session_state.steps = st.number_input("Log your steps for the day", value=st.session_state.steps, step=100, min_value=0)
-    st.progress(st.session_state.steps / step_goal if step_goal > 0 else 0)
-    st.write(f"{st.session_state.steps} / {step_goal} steps")
+    steps = st.number_input("Log your steps for the day", value=steps, step=100, min_value=0)
+    st.progress(min(steps / step_goal, 1.0) if step_goal > 0 else 0)
+    st.write(f"{steps} / {step_goal} steps")
+    if (water, steps) != store.habits(user):
+        store.set_habits(user, water, steps)
     st.divider()
 
+elif st.session_state.page == 'stations':
+    st.title("🏟️ Gym Stations")
+    st.write("Coach several people at once: every camera gets its own tracking process.")
+    registry = station_registry()
+    current_sources, current_exercise = registry.get('key', ((), exercises.EXERCISES[0].name))
+    with st.form("stations_form"):
+        sources_text = st.text_input("Cameras or video files (comma separated)", value=", ".join(map(str, current_sources)) or "0", help=f"Camera indices like 0, 1 or video paths. This machine can run about {stations.max_stations()} stations.")
+        exercise_names = [spec.name for spec in exercises.EXERCISES]
+        exercise = st.selectbox("Exercise", exercise_names, index=exercise_names.index(current_exercise))
+        col_start, col_stop = st.columns(2)
+        start = col_start.form_submit_button("▶️ Start stations", use_container_width=True)
+        stop = col_stop.form_submit_button("⏹️ Stop stations", use_container_width=True)
+    if start:
+        get_stations(stations.parse_sources(sources_text), exercise)
+    elif stop:
+        get_stations([], exercise)
+
+    supervisor = registry.get('supervisor')
+    if supervisor is None:
+        st.info("No stations running. Camera 0 is shared with the single-person workout, so stop stations before starting one.")
+    else:
+        @st.fragment(run_every=1 / render.DISPLAY_FPS)
+        def station_grid():
+            supervisor.restart_dead()
+            # One renderer per station for this session, so JPEG quality adapts across refreshes
+            renderers = st.session_state.get('station_renderers')
+            if renderers is None or renderers[0] != registry['key']:
+                renderers = st.session_state.station_renderers = (registry['key'], [render.FrameRenderer(None) for _ in supervisor.sources])
+            columns = st.columns(min(len(supervisor), 3))
+            for i, source in enumerate(supervisor.sources):
+                with columns[i % len(columns)]:
+                    st.subheader(f"Station {i + 1}: {source}")
+                    if supervisor.unavailable(i):
+                        st.error("Camera unavailable. Check the connection, then restart the stations.")
+                        continue
+                    status, frame = supervisor.status(i), supervisor.frame(i)
+                    if status is None or frame is None:
+                        st.info("Starting camera and pose model...")
+                        continue
+                    renderer = renderers[1][i]
+                    renderer.placeholder = st.empty()  # elements only live for one fragment run
+                    renderer.render(frame)
+                    progress = f"{status['elapsed']:.0f}s" if exercises.resolve(supervisor.exercise).hold else int(status['reps'])
+                    col_reps, col_fps = st.columns(2)
+                    col_reps.metric("Progress", progress)
+                    col_fps.metric("FPS", f"{status['fps']:.0f}")
+                    feedback_type = status['feedback_type'].decode()
+                    if not status['alive']:
+                        st.warning("Station stopped.")
+                    elif not status['has_pose']:
+                        st.warning("Step into the frame.")
+                    else:
+                        getattr(st, feedback_type if feedback_type in ('success', 'warning') else 'info')(status['feedback'].decode(errors='ignore'))
+        station_grid()
+
 elif st.session_state.page == 'welcome':
     st.title("Welcome to GYM BRO 🦾")
     st.subheader("Your Private, On-Device AI Personal Trainer")
@@ -128,6 +258,9 @@ elif st.session_state.page == 'welcome':
     if st.button("Generate My Workout"):
         if user_goal and st.session_state.age > 0 and st.session_state.weight > 0 and st.session_state.height > 0:
             st.session_state.goal = user_goal
+            # Start both model calls now so they run side by side while the plan page loads
+            st.session_state.llm_futures['plan'] = planner.submit(planner.get_workout_plan, user_goal)
+            st.session_state.llm_futures['nutrition'] = planner.submit_stream(planner.stream_nutrition_advice, user_goal, st.session_state.age, st.session_state.weight, st.session_state.height)
             st.session_state.page = 'plan'
             st.rerun()
         else:
@@ -135,17 +268,27 @@ elif st.session_state.page == 'welcome':
 
 elif st.session_state.page == 'plan':
     st.title("Your AI-Generated Plan")
-    if st.session_state.plan is None:
-        with st.spinner("GYM BRO is creating your personalized plan..."):
-            st.session_state.plan = planner.get_workout_plan(st.session_state.goal)
-    if st.session_state.nutrition_tip is None:
-         with st.spinner("Analyzing your nutritional needs..."):
-            st.session_state.nutrition_tip = planner.get_nutrition_advice(st.session_state.goal, st.session_state.age, st.session_state.weight, st.session_state.height)
+    futures = st.session_state.llm_futures
+    if st.session_state.plan is None and 'plan' not in futures:
+        futures['plan'] = planner.submit(planner.get_workout_plan, st.session_state.goal)
+    if st.session_state.nutrition_tip is None and 'nutrition' not in futures:
+        futures['nutrition'] = planner.submit_stream(planner.stream_nutrition_advice, st.session_state.goal, st.session_state.age, st.session_state.weight, st.session_state.height)
 
     with st.expander("Show My AI Nutrition Tip", expanded=True):
-        st.success(f"**GYM BRO says:** {st.session_state.nutrition_tip}")
+        tip_slot = st.empty()
+        if st.session_state.nutrition_tip is None:
+            # The tip appears word by word while the plan is still being generated
+            st.session_state.nutrition_tip = tip_slot.write_stream(futures['nutrition'])
+            del futures['nutrition']
+        tip_slot.success(f"**GYM BRO says:** {st.session_state.nutrition_tip}")
+
+    if st.session_state.plan is None:
+        with st.spinner("GYM BRO is creating your personalized plan..."):
+            st.session_state.plan = exercises.normalize_plan(futures.pop('plan').result())
 
     if st.session_state.plan:
+        get_voice().prerender(plan_phrases(st.session_state.plan))
+        prewarm_tracking()
         st.write(f"Here is a workout to help you **{st.session_state.goal}**:")
         for i, ex in enumerate(st.session_state.plan):
             st.write(f"**{i+1}. {ex['exercise']}**: {ex['target']} {ex['type']}")
@@ -160,29 +303,49 @@ elif st.session_state.page in ['workout', 'rest']:
     exercise_name, exercise_type, target_value = exercise_data['exercise'], exercise_data['type'], exercise_data['target']
     
     if st.session_state.page == 'rest':
-        st.balloons()
-        progress_val_text = f"{st.session_state.counter} reps" if exercise_type == 'reps' else f"{target_value} seconds"
-        speak("Great set! Time to rest.")
-        with st.spinner("GYM BRO is thinking of some encouragement..."):
-            motivation = get_ai_motivation(st.session_state.goal, exercise_name, progress_val_text, st.session_state.current_exercise_index + 1, len(st.session_state.plan))
-        speak(motivation)
-        st.success(motivation)
         rest_time = 15
-        progress_bar = st.progress(1.0)
-        st_rest_header = st.header(f"Rest: {rest_time}s")
-        for i in range(rest_time, 0, -1):
-            st_rest_header.header(f"Rest: {i}s")
-            time.sleep(1)
-            progress_bar.progress(float(i) / rest_time)
-        st.session_state.current_exercise_index += 1
-        if st.session_state.current_exercise_index >= len(st.session_state.plan):
-            st.session_state.page = 'finished'
-        else:
-            st.session_state.page = 'workout'
-            st.session_state.counter = 0; st.session_state.stage = None; st.session_state.elapsed_time = 0.0; st.session_state.timer_started = False; st.session_state.last_time = 0.0; st.session_state.user_ready = False
-            next_ex = st.session_state.plan[st.session_state.current_exercise_index]
-            speak(f"Rest over. Next up: {next_ex['target']} {next_ex['type']} of {next_ex['exercise']}.")
-        st.rerun()
+        motivation_slot = st.empty()
+        if st.session_state.rest_until is None:
+            # First run of this rest: celebrate, get the motivation and start the countdown
+            st.balloons()
+            prewarm_tracking()
+            progress_val_text = f"{st.session_state.counter} reps" if exercise_type == 'reps' else f"{target_value} seconds"
+            speak("Great set! Time to rest.")
+            get_history().add_set(
+                st.session_state.user_name, st.session_state.workout_id, st.session_state.goal, exercise_name, exercise_type, target_value,
+                st.session_state.counter, st.session_state.elapsed_time, st.session_state.set_started_at or time.time())
+            motivation_args = (st.session_state.goal, exercise_name, progress_val_text, st.session_state.current_exercise_index + 1, len(st.session_state.plan))
+            prefetched = st.session_state.llm_futures.pop('motivation', None)
+            if prefetched is not None and prefetched[0] == motivation_args:
+                stream = prefetched[1]
+            else:
+                stream = planner.stream_ai_motivation(*motivation_args)
+            motivation = motivation_slot.write_stream(stream)
+            speak(motivation)
+            st.session_state.rest_motivation = motivation
+            st.session_state.rest_until = time.time() + rest_time
+        motivation_slot.success(st.session_state.rest_motivation)
+
+        # Only this fragment reruns each second; the script thread is never put to sleep
+        @st.fragment(run_every=1)
+        def rest_countdown():
+            remaining = max(0, math.ceil(st.session_state.rest_until - time.time()))
+            st.header(f"Rest: {remaining}s")
+            st.progress(remaining / rest_time)
+            if remaining > 0:
+                return
+            st.session_state.rest_until = None
+            st.session_state.current_exercise_index += 1
+            if st.session_state.current_exercise_index >= len(st.session_state.plan):
+                st.session_state.page = 'finished'
+            else:
+                st.session_state.page = 'workout'
+                st.session_state.counter = 0; st.session_state.stage = None; st.session_state.elapsed_time = 0.0; st.session_state.timer_started = False; st.session_state.last_time = 0.0; st.session_state.user_ready = False; st.session_state.set_started_at = None
+                next_ex = st.session_state.plan[st.session_state.current_exercise_index]
+                speak(f"Rest over. Next up: {next_ex['target']} {next_ex['type']} of {next_ex['exercise']}.")
+            st.rerun()
+        rest_countdown()
+        st.stop()
 
     # --- WORKOUT PAGE LOGIC ---
     FRAME_WINDOW = st.image([])
@@ -206,126 +369,102 @@ elif st.session_state.page in ['workout', 'rest']:
             st.rerun()
         st.stop()
     
-    cap = cv2.VideoCapture(0)
-    mp_pose = mp.solutions.pose
-    frame_count = 0
-    with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
-        while cap.isOpened() and st.session_state.page == 'workout':
-            success, image = cap.read()
-            if not success: break
-            frame_count += 1
-            if frame_count % 2 != 0: continue
-
-            image = cv2.cvtColor(cv2.flip(image, 1), cv2.COLOR_BGR2RGB)
-            image.flags.writeable = False
-            results = pose.process(image)
-            image.flags.writeable = True
-            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-
-            is_complete = False
-            try:
-                landmarks = results.pose_landmarks.landmark
-                mp_p = mp.solutions.pose.PoseLandmark
-                
-                primary_joints = [mp_p.LEFT_SHOULDER, mp_p.LEFT_HIP, mp_p.LEFT_KNEE, mp_p.RIGHT_KNEE, mp_p.LEFT_ANKLE, mp_p.RIGHT_ANKLE]
-                primary_joints_visible = all(landmarks[joint].visibility > 0.7 for joint in primary_joints)
-                
-                if not primary_joints_visible:
-                    st.session_state.feedback = "I can't see you clearly! Stand further back."
-                    st.session_state.feedback_type = "warning"
-                else:
-                    if 'Squat' in exercise_name:
-                        hip = [landmarks[mp_p.LEFT_HIP.value].x, landmarks[mp_p.LEFT_HIP.value].y]
-                        knee = [landmarks[mp_p.LEFT_KNEE.value].x, landmarks[mp_p.LEFT_KNEE.value].y]
-                        ankle = [landmarks[mp_p.LEFT_ANKLE.value].x, landmarks[mp_p.LEFT_ANKLE.value].y]
-                        angle = calculate_angle(hip, knee, ankle)
-                        if angle > 165: 
-                            st.session_state.stage = "up"; st.session_state.feedback = "Ready to squat."; st.session_state.feedback_type = "info"
-                        elif angle < 90 and st.session_state.stage == 'up':
-                            st.session_state.stage = "down"; st.session_state.counter += 1; speak(str(st.session_state.counter)); st.session_state.feedback = "Good depth!"; st.session_state.feedback_type = "success"
-                        elif angle > 90 and st.session_state.stage == 'up':
-                            st.session_state.feedback = "Go lower!"; st.session_state.feedback_type = "warning"
-
-                    elif 'Lunge' in exercise_name:
-                        left_hip = [landmarks[mp_p.LEFT_HIP.value].x, landmarks[mp_p.LEFT_HIP.value].y]
-                        left_knee = [landmarks[mp_p.LEFT_KNEE.value].x, landmarks[mp_p.LEFT_KNEE.value].y]
-                        left_ankle = [landmarks[mp_p.LEFT_ANKLE.value].x, landmarks[mp_p.LEFT_ANKLE.value].y]
-                        right_hip = [landmarks[mp_p.RIGHT_HIP.value].x, landmarks[mp_p.RIGHT_HIP.value].y]
-                        right_knee = [landmarks[mp_p.RIGHT_KNEE.value].x, landmarks[mp_p.RIGHT_KNEE.value].y]
-                        right_ankle = [landmarks[mp_p.RIGHT_ANKLE.value].x, landmarks[mp_p.RIGHT_ANKLE.value].y]
-                        left_knee_angle = calculate_angle(left_hip, left_knee, left_ankle)
-                        right_knee_angle = calculate_angle(right_hip, right_knee, right_ankle)
-                        if left_knee_angle > 160 and right_knee_angle > 160:
-                            st.session_state.stage = "up"; st.session_state.feedback = "Ready to lunge."; st.session_state.feedback_type = "info"
-                        if (left_knee_angle < 100 or right_knee_angle < 100) and st.session_state.stage == 'up':
-                            st.session_state.stage = "down"; st.session_state.counter += 1; speak(str(st.session_state.counter)); st.session_state.feedback = "Great lunge!"; st.session_state.feedback_type = "success"
-                    
-                    elif 'Push-up' in exercise_name:
-                        shoulder = [landmarks[mp_p.LEFT_SHOULDER.value].x, landmarks[mp_p.LEFT_SHOULDER.value].y]
-                        elbow = [landmarks[mp_p.LEFT_ELBOW.value].x, landmarks[mp_p.LEFT_ELBOW.value].y]
-                        wrist = [landmarks[mp_p.LEFT_WRIST.value].x, landmarks[mp_p.LEFT_WRIST.value].y]
-                        angle = calculate_angle(shoulder, elbow, wrist)
-                        if angle > 160: 
-                            st.session_state.stage = "up"; st.session_state.feedback = "Ready."; st.session_state.feedback_type = "info"
-                        if angle < 90 and st.session_state.stage == 'up':
-                            st.session_state.stage = "down"; st.session_state.counter += 1; speak(str(st.session_state.counter)); st.session_state.feedback = "Great push!"; st.session_state.feedback_type = "success"
-                    
-                    elif 'Jumping Jack' in exercise_name:
-                        l_wrist_y = landmarks[mp_p.LEFT_WRIST.value].y; l_shoulder_y = landmarks[mp_p.LEFT_SHOULDER.value].y
-                        if l_wrist_y > l_shoulder_y: 
-                            st.session_state.stage = "down"; st.session_state.feedback = "Jump!"; st.session_state.feedback_type = "info"
-                        if l_wrist_y < l_shoulder_y and st.session_state.stage == "down":
-                            st.session_state.stage = "up"; st.session_state.counter += 1; speak(str(st.session_state.counter)); st.session_state.feedback_type = "success"
-                    
-                    elif 'Plank' in exercise_name:
-                        if st.session_state.user_ready:
-                            shoulder = [landmarks[mp_p.LEFT_SHOULDER.value].x, landmarks[mp_p.LEFT_SHOULDER.value].y]
-                            hip = [landmarks[mp_p.LEFT_HIP.value].x, landmarks[mp_p.LEFT_HIP.value].y]
-                            ankle = [landmarks[mp_p.LEFT_ANKLE.value].x, landmarks[mp_p.LEFT_ANKLE.value].y]
-                            angle = calculate_angle(shoulder, hip, ankle)
-                            if angle > 155 and angle < 195:
-                                if not st.session_state.timer_started:
-                                    st.session_state.timer_started = True; st.session_state.last_time = time.time(); st.session_state.feedback = "Great form! Hold it."; st.session_state.feedback_type = "success"
-                                else:
-                                    current_time = time.time(); st.session_state.elapsed_time += current_time - st.session_state.last_time; st.session_state.last_time = current_time
+    # Generate the end-of-set motivation while the set is still in progress
+    expected_progress = f"{target_value} reps" if exercise_type == 'reps' else f"{target_value} seconds"
+    motivation_args = (st.session_state.goal, exercise_name, expected_progress, st.session_state.current_exercise_index + 1, len(st.session_state.plan))
+    prefetched = st.session_state.llm_futures.get('motivation')
+    if prefetched is None or prefetched[0] != motivation_args:
+        st.session_state.llm_futures['motivation'] = (motivation_args, planner.submit_stream(planner.stream_ai_motivation, *motivation_args))
+
+    if st.session_state.set_started_at is None:
+        st.session_state.set_started_at = time.time()
+
+    # Resolve the exercise once per set; the tracker owns the per-frame state
+    spec = exercises.resolve(exercise_name)
+    tracker = exercises.ExerciseTracker(spec, counter=st.session_state.counter, stage=st.session_state.stage, elapsed_time=st.session_state.elapsed_time, feedback=st.session_state.feedback, feedback_type=st.session_state.feedback_type) if spec else None
+
+    st_exercise.subheader(f"Current Exercise: {exercise_name}")
+    st_target.subheader(f"Target: {target_value} {exercise_type}")
+    st_feedback_header.subheader("GYM BRO Feedback:")
+    if tracker is None:
+        st.session_state.feedback = "GYM BRO can't track this exercise yet. Skip to rest when you're done."
+        st.session_state.feedback_type = "warning"
+
+    # Text widgets are only re-sent when their content changes
+    progress_slot, feedback_slot = render.TextSlot(st_progress), render.TextSlot(st_feedback)
+    def show_progress():
+        progress_val = st.session_state.counter if exercise_type == 'reps' else st.session_state.elapsed_time
+        progress_slot.show('header', f"Your Progress: {int(progress_val)}")
+        feedback_slot.show(st.session_state.feedback_type if st.session_state.feedback_type in ('success', 'warning') else 'info', st.session_state.feedback)
+    show_progress()
+    renderer = render.FrameRenderer(FRAME_WINDOW)
+
+    # Camera and pose model are shared and stay warm across reruns and sets
+    make_pose = pose_resource().lease
+    # Closed even when a rerun or stop interrupts the loop, so the recording keeps its last frames
+    recording_context = recording.LandmarkRecorder(st.session_state.recording_path) if st.session_state.record_landmarks else contextlib.nullcontext()
+    exercise_id = recording.exercise_id(spec)
+    last_frame_at = None
+    try:
+        with recording_context as recorder, resources.camera(0).lease() as cap:
+            source = pipeline.PosePipeline(cap, make_pose) if st.session_state.pipelined else pipeline.SequentialSource(cap, make_pose)
+            with source:
+                # Measured and predicted frames drive the tracker the same way
+                for image, landmarks, captured_at, predicted in source.frames():
+                    if st.session_state.page != 'workout': break
+
+                    with METRICS.stage('rules'):
+                        if recorder is not None and not predicted:
+                            with METRICS.stage('record', blocking=True):
+                                recorder.append(time.time(), exercise_id, landmarks)
+
+                        changed = False
+                        if tracker is not None:
+                            if landmarks is None:
+                                changed = tracker.lost()
                             else:
-                                if st.session_state.timer_started:
-                                    st.session_state.timer_started = False; st.session_state.feedback = "Straighten your back!"; st.session_state.feedback_type = "warning"
-                
-                if exercise_type == 'reps' and st.session_state.counter >= target_value: is_complete = True
-                elif exercise_type == 'time' and st.session_state.elapsed_time >= target_value: is_complete = True
-            
-            except Exception as e:
-                st.session_state.feedback = "Tracking... get into position."
-                st.session_state.feedback_type = "info"
-            
-            FRAME_WINDOW.image(image, channels='BGR')
-            st_exercise.subheader(f"Current Exercise: {exercise_name}")
-            st_target.subheader(f"Target: {target_value} {exercise_type}")
-            progress_val = st.session_state.counter if exercise_type == 'reps' else st.session_state.elapsed_time
-            st_progress.header(f"Your Progress: {int(progress_val)}")
-            st_feedback_header.subheader("GYM BRO Feedback:")
-            if st.session_state.feedback_type == "success": st_feedback.success(st.session_state.feedback)
-            elif st.session_state.feedback_type == "warning": st_feedback.warning(st.session_state.feedback)
-            else: st_feedback.info(st.session_state.feedback)
-
-            if is_complete:
-                st.session_state.page = 'rest'
-                cap.release()
-                st.rerun()
-    cap.release()
+                                reps = tracker.counter
+                                changed = tracker.update(landmarks, captured_at, not predicted)
+                                if tracker.counter != reps:
+                                    with METRICS.stage('speak', blocking=True):
+                                        speak(str(tracker.counter))
+
+                    with METRICS.stage('render'):
+                        if renderer.due():
+                            if METRICS.enabled:
+                                METRICS.overlay(image)
+                            renderer.render(image)
+                        if changed:
+                            tracker.sync(st.session_state)
+                            show_progress()
+
+                    if METRICS.enabled:
+                        now = time.perf_counter()
+                        if last_frame_at is not None:
+                            METRICS.record('frame', now - last_frame_at)
+                        last_frame_at = now
+                        METRICS.gauge('frames.dropped', source.dropped)
+                        METRICS.maybe_export()
+
+                    if tracker is not None and tracker.progress() >= target_value:
+                        st.session_state.page = 'rest'
+                        break
+    except Exception as e:
+        # The camera couldn't be opened, or inference failed mid-set (frames() re-raises whatever
+        # the inference thread hit, e.g. cv2.error). Streamlit's rerun/stop signals are BaseExceptions
+        # and still pass through.
+        st.error(f"The workout was interrupted ({type(e).__name__}: {e}). Check the camera, then reload the page to try again.")
+    if st.session_state.page == 'rest':
+        st.rerun()
 
 elif st.session_state.page == 'finished':
     st.title("🎉 Workout Complete! 🎉"); st.balloons()
     speak("Congratulations! You completed your workout. Well done!")
     st.success("You have successfully completed the workout plan. Great job!")
 
-    if 'last_completed_goal' not in st.session_state or st.session_state.last_completed_goal != st.session_state.goal:
-        today_date = datetime.now().strftime("%B %d, %Y")
-        num_exercises = len(st.session_state.plan)
-        summary = f"{today_date}: Completed {num_exercises} exercises for your goal: '{st.session_state.goal}'."
-        st.session_state.workout_history.append(summary)
-        st.session_state.last_completed_goal = st.session_state.goal
+    if st.session_state.get('last_completed_workout') != st.session_state.workout_id:
+        get_history().complete_workout(st.session_state.user_name)
+        st.session_state.last_completed_workout = st.session_state.workout_id
 
     if st.button("Do Another Workout"): 
         initialize_state()
@@ -0,0 +1,154 @@
+"""
+Voice feedback: a content-addressed phrase cache and a background player.
+
+Synthesizing speech takes a network round trip (gTTS) plus a disk write, which
+used to happen on the frame loop for every counted rep. Now `VoicePlayer.say()`
+only drops the text on a queue; a worker thread looks the phrase up in the
+on-disk cache (synthesizing it on a miss) and plays it. Stock phrases such as
+rep numbers are pre-rendered in the background so they're ready offline.
+
+The synthesizer is pluggable. Set GYMBRO_TTS to 'gtts' (default), 'pyttsx3'
+(offline, if installed) or 'silent' (fills the cache with empty clips).
+"""
+import hashlib
+import os
+import queue
+import threading
+
+from telemetry import METRICS
+
+CACHE_DIR = '.audio_cache'
+
+STOCK_PHRASES = [str(n) for n in range(1, 101)] + [
+    "Great set! Time to rest.",
+    "Congratulations! You completed your workout. Well done!",
+]
+
+
+class GTTSSynthesizer:
+    name = 'gtts'
+    extension = '.mp3'
+
+    def __init__(self, lang='en'):
+        self.lang = lang
+
+    def __call__(self, text, path):
+        from gtts import gTTS
+        gTTS(text=text, lang=self.lang, slow=False).save(path)
+
+
+class Pyttsx3Synthesizer:
+    name = 'pyttsx3'
+    extension = '.wav'
+
+    def __call__(self, text, path):
+        import pyttsx3
+        engine = pyttsx3.init()
+        engine.save_to_file(text, path)
+        engine.runAndWait()
+
+
+class SilentSynthesizer:
+    """
+    Offline stub: writes empty clips, which the player skips.
+    """
+    name = 'silent'
+    extension = '.mp3'
+
+    def __call__(self, text, path):
+        open(path, 'wb').close()
+
+
+SYNTHESIZERS = {
+    'gtts': GTTSSynthesizer,
+    'pyttsx3': Pyttsx3Synthesizer,
+    'silent': SilentSynthesizer,
+}
+
+
+def make_synthesizer(name=None):
+    name = name or os.environ.get('GYMBRO_TTS', 'gtts')
+    try:
+        return SYNTHESIZERS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown TTS backend '{name}'. Choose from: {', '.join(SYNTHESIZERS)}")
+
+
+class PhraseCache:
+    """
+    Maps phrase text to an audio file, keyed by a hash of the backend and text.
+    """
+
+    def __init__(self, synthesizer=None, cache_dir=CACHE_DIR):
+        self.synthesizer = synthesizer or make_synthesizer()
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path_for(self, text):
+        key = hashlib.sha256(f"{self.synthesizer.name}\0{text}".encode('utf-8')).hexdigest()[:24]
+        return os.path.join(self.cache_dir, key + self.synthesizer.extension)
+
+    def __contains__(self, text):
+        return os.path.exists(self.path_for(text))
+
+    def get(self, text):
+        """
+        Returns the audio file for `text`, synthesizing it first on a cache miss.
+        """
+        path = self.path_for(text)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp{self.synthesizer.extension}"
+            with METRICS.stage('tts.synthesize'):
+                self.synthesizer(text, tmp_path)
+            os.replace(tmp_path, path)  # atomic, so a half-written clip is never played
+        return path
+
+
+class VoicePlayer:
+    """
+    Plays phrases on a background thread. `say()` never blocks: if the player
+    is backed up, the new phrase is dropped rather than stalling the caller.
+    """
+
+    def __init__(self, cache=None, max_pending=8):
+        self.cache = cache or PhraseCache()
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._play_loop, name='gymbro-voice', daemon=True)
+        self._thread.start()
+
+    def say(self, text):
+        try:
+            self._queue.put_nowait(text)
+        except queue.Full:
+            self.dropped += 1
+
+    def prerender(self, phrases):
+        """
+        Fills the cache for `phrases` on a separate background thread.
+        """
+        missing = [text for text in phrases if text not in self.cache]
+        if missing:
+            threading.Thread(target=self._prerender, args=(missing,), name='gymbro-voice-prerender', daemon=True).start()
+
+    def _prerender(self, phrases):
+        for text in phrases:
+            try:
+                self.cache.get(text)
+            except Exception as e:
+                print(f"Error pre-rendering speech: {e}")
+                return
+
+    def _play_loop(self):
+        try:
+            from playsound import playsound
+        except ImportError:
+            playsound = None  # still keep the cache warm on machines without audio output
+        while True:
+            text = self._queue.get()
+            try:
+                path = self.cache.get(text)
+                if playsound is not None and os.path.getsize(path):
+                    playsound(os.path.abspath(path), block=True)
+            except Exception as e:
+                print(f"Error in speak function: {e}")
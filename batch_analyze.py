@@ -0,0 +1,178 @@
+"""
+Headless offline analysis of recorded workout videos.
+
+Spreads a directory of videos across a process pool (a fresh MediaPipe Pose
+for each video, no GUI) and writes, for every video <name>.<ext>:
+  - <name>_<ext>.json        rep count, per-rep timestamps and hold time
+  - <name>_<ext>_angles.csv  per-frame joint angles
+plus a summary.csv covering the whole run.
+
+Usage:
+    python batch_analyze.py videos/ --exercise "Bodyweight Squats" --out results/
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import angles
+import exercises
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.webm')
+
+ANGLE_ENGINE = angles.AngleEngine()
+
+# Set in each worker process by _init_worker
+_model_complexity = 1
+_mirror = True
+
+
+def score(exercise, timestamps, pts):
+    """
+    Replays the live coach's rep/hold logic over a (T, 33, 4) landmark stack.
+    Frames without a detected pose are NaN and are ignored.
+    """
+    spec = exercises.resolve(exercise)
+    if spec is None:
+        raise ValueError(f"Don't know how to score '{exercise}'.")
+    tracker = exercises.ExerciseTracker(spec).run(timestamps, pts)
+    return {
+        'reps': tracker.counter,
+        'rep_times': [round(t, 3) for t in tracker.rep_times],
+        'hold_seconds': round(tracker.elapsed_time, 3),
+    }
+
+
+def _init_worker(model_complexity, mirror):
+    global _model_complexity, _mirror
+    import cv2
+    cv2.setNumThreads(1)  # one core per worker; the pool provides the parallelism
+    _model_complexity = model_complexity
+    _mirror = mirror
+
+
+def extract_landmarks(path):
+    """
+    Runs pose estimation over every frame of a video.
+    Returns (timestamps in seconds, (T, 33, 4) landmark array, fps).
+    """
+    import cv2
+    import mediapipe as mp
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    timestamps, frames = [], []
+    missing = np.full((angles.NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+    # A video-mode Pose tracks across frames, so each video gets its own graph
+    pose = mp.solutions.pose.Pose(model_complexity=_model_complexity, min_detection_confidence=0.5, min_tracking_confidence=0.5)
+    try:
+        while True:
+            success, frame = cap.read()
+            if not success: break
+            if _mirror:
+                frame = cv2.flip(frame, 1)  # the live coach sees a mirrored camera
+            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            image.flags.writeable = False
+            results = pose.process(image)
+            timestamps.append(len(timestamps) / fps)
+            if results.pose_landmarks:
+                frames.append(angles.landmarks_to_array(results.pose_landmarks.landmark))
+            else:
+                frames.append(missing)
+    finally:
+        pose.close()
+        cap.release()
+    pts = np.stack(frames) if frames else np.empty((0, angles.NUM_LANDMARKS, 4), dtype=np.float32)
+    return timestamps, pts, fps
+
+
+def write_angles_csv(path, timestamps, pts):
+    joint_angles = ANGLE_ENGINE(pts)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['frame', 'time_s', *ANGLE_ENGINE.names])
+        for i, (t, row) in enumerate(zip(timestamps, joint_angles.round(2).tolist())):
+            writer.writerow([i, round(t, 3), *row])
+
+
+def analyze_video(path, exercise, out_dir):
+    """
+    Worker entry point: scores one video and writes its outputs.
+    """
+    started = time.perf_counter()
+    timestamps, pts, fps = extract_landmarks(path)
+    stem = output_stem(path)
+    summary = {
+        'video': path,
+        'exercise': exercise,
+        'fps': fps,
+        'frames': len(timestamps),
+        'frames_with_pose': int((~np.isnan(pts[:, 0, 0])).sum()),
+        **score(exercise, timestamps, pts),
+    }
+    write_angles_csv(os.path.join(out_dir, f"{stem}_angles.csv"), timestamps, pts)
+    with open(os.path.join(out_dir, f"{stem}.json"), 'w') as f:
+        json.dump(summary, f, indent=2)
+    summary['processing_s'] = round(time.perf_counter() - started, 2)
+    return summary
+
+
+def output_stem(path):
+    """
+    "videos/a.mp4" -> "a_mp4", so a.mp4 and a.mov don't overwrite each other's outputs.
+    """
+    name, ext = os.path.splitext(os.path.basename(path))
+    return f"{name}_{ext[1:].lower()}"
+
+
+def find_videos(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(VIDEO_EXTENSIONS)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count reps in recorded workout videos without a GUI.")
+    parser.add_argument('input_dir', help="Directory containing workout videos")
+    parser.add_argument('--exercise', default='Bodyweight Squats', help="Exercise performed in the videos")
+    parser.add_argument('--out', default='analysis', help="Output directory")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument('--model-complexity', type=int, default=1, choices=(0, 1, 2))
+    parser.add_argument('--no-mirror', action='store_true', help="Don't mirror frames like the live webcam view does")
+    args = parser.parse_args()
+
+    spec = exercises.resolve(args.exercise)
+    if spec is None:
+        parser.error(f"Can't score '{args.exercise}'. Known exercises: {', '.join(s.name for s in exercises.EXERCISES)}")
+    videos = find_videos(args.input_dir)
+    if not videos:
+        parser.error(f"No videos found in {args.input_dir}")
+    os.makedirs(args.out, exist_ok=True)
+
+    started = time.perf_counter()
+    summaries = []
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(args.model_complexity, not args.no_mirror)) as pool:
+        futures = {pool.submit(analyze_video, path, spec.name, args.out): path for path in videos}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                print(f"Failed to analyze {path}: {e}")
+                continue
+            summaries.append(summary)
+            print(f"{os.path.basename(path)}: {summary['reps']} reps, {summary['hold_seconds']}s hold ({summary['processing_s']}s)")
+
+    with open(os.path.join(args.out, 'summary.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['video', 'exercise', 'frames', 'frames_with_pose', 'reps', 'hold_seconds', 'processing_s'], extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(sorted(summaries, key=lambda s: s['video']))
+    print(f"Analyzed {len(summaries)}/{len(videos)} videos in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""
+Benchmarks for the per-frame hot path. Runs on a plain CPU box, no webcam.
+
+Each stage of the workout loop is timed separately and end to end, fed with
+synthetic frames and landmarks, or with real ones from --video / --recording.
+Results are reported as frames per second and p50/p95/p99 latency.
+
+Usage:
+    python bench.py                                  # synthetic inputs
+    python bench.py --recording recordings/a.gblm    # recorded landmarks
+    python bench.py --video squats.mp4               # real frames for the vision stages
+    python bench.py --save-baseline                  # store results in bench_baseline.json
+    python bench.py --baseline bench_baseline.json   # flag regressions (exit code 1)
+
+Stages whose dependencies aren't installed (OpenCV, MediaPipe) are skipped.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+
+import angles
+import exercises
+
+DEFAULT_BASELINE = 'bench_baseline.json'
+
+
+# --- inputs ---
+def synthetic_squats(frames=300, fps=30.0, period_s=2.0, seed=0):
+    """
+    A (T, 33, 4) landmark sequence of someone squatting, with a little noise.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(frames) / fps
+    pts = np.zeros((frames, angles.NUM_LANDMARKS, 4), dtype=np.float32)
+    pts[..., :2] = 0.5 + rng.normal(0, 0.01, (frames, angles.NUM_LANDMARKS, 2))
+    pts[..., angles.VISIBILITY] = 0.99
+    knee = np.radians(115 + 55 * np.cos(2 * np.pi * t / period_s))
+    for hip, knee_lm, ankle, shoulder in ((angles.LEFT_HIP, angles.LEFT_KNEE, angles.LEFT_ANKLE, angles.LEFT_SHOULDER),
+                                          (angles.RIGHT_HIP, angles.RIGHT_KNEE, angles.RIGHT_ANKLE, angles.RIGHT_SHOULDER)):
+        pts[:, knee_lm, :2] = (0.5, 0.7)
+        pts[:, hip, 0], pts[:, hip, 1] = 0.5, 0.5
+        pts[:, ankle, 0] = 0.5 + 0.2 * np.sin(knee)
+        pts[:, ankle, 1] = 0.7 - 0.2 * np.cos(knee)
+        pts[:, shoulder, :2] = (0.5, 0.25)
+    return t, pts
+
+
+def synthetic_frames(count=30, width=640, height=480, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def video_frames(path, limit=300):
+    import cv2
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < limit:
+        success, frame = cap.read()
+        if not success: break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise SystemExit(f"Couldn't read any frames from {path}")
+    return frames
+
+
+# --- timing ---
+def measure(fn, inputs, iterations, warmup=20):
+    """
+    Calls fn(input) `iterations` times, cycling through inputs. Returns per-call seconds.
+    """
+    n = len(inputs)
+    for i in range(min(warmup, iterations)):
+        fn(inputs[i % n])
+    samples = np.empty(iterations)
+    clock = time.perf_counter_ns
+    for i in range(iterations):
+        item = inputs[i % n]
+        start = clock()
+        fn(item)
+        samples[i] = clock() - start
+    return samples / 1e9
+
+
+def summarize(samples):
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        'fps': round(1.0 / samples.mean(), 1),
+        'p50_ms': round(p50 * 1e3, 4),
+        'p95_ms': round(p95 * 1e3, 4),
+        'p99_ms': round(p99 * 1e3, 4),
+        'iterations': len(samples),
+    }
+
+
+# --- stages ---
+def _legacy_angle(a, b, c):
+    a, b, c = np.array(a), np.array(b), np.array(c)
+    radians = np.arctan2(c[1]-b[1], c[0]-b[0]) - np.arctan2(a[1]-b[1], a[0]-b[0])
+    angle = np.abs(radians*180.0/np.pi)
+    return 360 - angle if angle > 180.0 else angle
+
+
+def landmark_stages(pts, iterations):
+    """
+    Stages that only need landmarks.
+    """
+    landmark_lists = [angles.array_to_landmarks(frame) for frame in pts[:120]]
+    buf = np.empty((angles.NUM_LANDMARKS, 4), dtype=np.float32)
+    engine = angles.AngleEngine(('left_knee', 'right_knee', 'left_elbow', 'left_body'))
+    joints = [angles.JOINTS[name] for name in engine.names]
+
+    def legacy_angles(landmarks):
+        # What the loop used to do: attribute lookups and small arrays for every joint
+        return [_legacy_angle([landmarks[a].x, landmarks[a].y], [landmarks[b].x, landmarks[b].y], [landmarks[c].x, landmarks[c].y])
+                for a, b, c in joints]
+
+    squat = exercises.EXERCISES[0]
+    legacy_squat = exercises.ExerciseTracker(squat)
+    live_squat = exercises.ExerciseTracker(squat)
+    hip, knee, ankle = angles.JOINTS['left_knee']
+    visible = squat.visible_joints
+
+    def frame_legacy(landmarks):
+        # The original per-frame work: attribute lookups, calculate_angle and a visibility scan
+        if all(landmarks[i].visibility > squat.min_visibility for i in visible):
+            legacy_squat._step(angles.calculate_angle([landmarks[hip].x, landmarks[hip].y], [landmarks[knee].x, landmarks[knee].y],
+                                                      [landmarks[ankle].x, landmarks[ankle].y]), 0.0)
+
+    results = {
+        'frame_legacy': summarize(measure(frame_legacy, landmark_lists, iterations)),
+        'frame_live': summarize(measure(lambda landmarks: live_squat.update(landmarks, 0.0), landmark_lists, iterations)),
+        'angles_legacy_per_call': summarize(measure(legacy_angles, landmark_lists, iterations)),
+        'landmarks_to_array': summarize(measure(lambda lms: angles.landmarks_to_array(lms, out=buf), landmark_lists, iterations)),
+        'angle_engine': summarize(measure(engine, pts, iterations)),
+    }
+    for spec in exercises.EXERCISES:
+        tracker = exercises.ExerciseTracker(spec)
+        clock = iter(range(10**9))
+        results[f'tracker_{spec.match.lower().replace(" ", "_")}'] = summarize(
+            measure(lambda frame: tracker.update(frame, next(clock) / 30.0), landmark_lists, iterations))
+    t = np.arange(len(pts)) / 30.0
+    batch = measure(lambda _: exercises.ExerciseTracker(exercises.EXERCISES[0]).run(t.tolist(), pts), [None], max(iterations // 100, 5), warmup=2)
+    results['tracker_run_batch_per_frame'] = summarize(batch / len(pts))
+    return results
+
+
+def vision_stages(frames, iterations):
+    """
+    Stages that need OpenCV / MediaPipe and camera-sized frames.
+    """
+    results = {}
+    try:
+        import cv2
+    except ImportError:
+        print("OpenCV not installed, skipping colour conversion and pose stages.")
+        return results
+
+    def convert(frame):
+        image = cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB)
+        return cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    results['color_convert'] = summarize(measure(convert, frames, iterations))
+
+    import motion
+    gate = motion.MotionGate()
+    results['motion_gate'] = summarize(measure(gate.should_infer, frames, iterations))
+    predictor = motion.LandmarkPredictor()
+    t, pts = synthetic_squats(frames=2)
+    predictor.observe(angles.array_to_landmarks(pts[0]), t[0])
+    predictor.observe(angles.array_to_landmarks(pts[1]), t[1])
+    results['landmark_predict'] = summarize(measure(lambda dt: predictor.predict(t[1] + dt), [0.01, 0.02, 0.03], iterations))
+
+    try:
+        import mediapipe as mp
+    except ImportError:
+        print("MediaPipe not installed, skipping pose stages.")
+        return results
+
+    pose_iterations = max(iterations // 20, 30)
+    tracker = exercises.ExerciseTracker(exercises.EXERCISES[0])
+    rgb_frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames]
+    with mp.solutions.pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
+        results['pose_process'] = summarize(measure(pose.process, rgb_frames, pose_iterations, warmup=5))
+
+        def end_to_end(frame):
+            image = cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB)
+            image.flags.writeable = False
+            output = pose.process(image)
+            image.flags.writeable = True
+            image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+            if output.pose_landmarks:
+                tracker.update(output.pose_landmarks.landmark, time.perf_counter())
+            else:
+                tracker.lost()
+            return image
+        results['end_to_end'] = summarize(measure(end_to_end, frames, pose_iterations, warmup=5))
+    return results
+
+
+# --- baseline ---
+def compare(results, baseline, tolerance):
+    """
+    Returns the stages whose p50 latency regressed by more than `tolerance`.
+    """
+    regressions = []
+    for stage, stats in results.items():
+        before = baseline.get('stages', {}).get(stage)
+        if before and stats['p50_ms'] > before['p50_ms'] * (1 + tolerance):
+            regressions.append((stage, before['p50_ms'], stats['p50_ms']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the per-frame hot path.")
+    parser.add_argument('--iterations', type=int, default=2000, help="Iterations for the cheap stages")
+    parser.add_argument('--recording', help="Use landmarks from a .gblm recording instead of synthetic ones")
+    parser.add_argument('--video', help="Use frames from a video file instead of synthetic ones")
+    parser.add_argument('--baseline', help="Compare against a stored baseline and exit 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed p50 slowdown before flagging (0.25 = 25%%)")
+    parser.add_argument('--save-baseline', nargs='?', const=DEFAULT_BASELINE, help="Write results as the new baseline")
+    args = parser.parse_args()
+
+    if args.recording:
+        import recording
+        records = recording.load(args.recording)
+        pts = np.ascontiguousarray(records['landmarks'][records['flags'] & recording.HAS_POSE > 0])
+        if len(pts) == 0:
+            raise SystemExit(f"{args.recording} has no frames with a pose.")
+    else:
+        _, pts = synthetic_squats()
+    frames = video_frames(args.video) if args.video else synthetic_frames()
+
+    results = landmark_stages(pts, args.iterations)
+    results.update(vision_stages(frames, args.iterations))
+
+    print(f"{'stage':<30}{'fps':>12}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}")
+    for stage, stats in results.items():
+        print(f"{stage:<30}{stats['fps']:>12,.0f}{stats['p50_ms']:>11.4f}{stats['p95_ms']:>11.4f}{stats['p99_ms']:>11.4f}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'machine': platform.platform(), 'python': platform.python_version(), 'stages': results}, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for stage, before, after in regressions:
+            print(f"REGRESSION {stage}: p50 {before:.4f} ms -> {after:.4f} ms")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == '__main__':
+    main()
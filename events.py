@@ -0,0 +1,212 @@
+"""
+Publishes tracking events as NDJSON over a local TCP or Unix socket.
+
+Kiosk displays and loggers only need "rep 7", "stage down", "go lower!", not
+video, so the headless tracker (pose_detector.py --serve) sends one compact
+JSON object per line to every connected subscriber. Each event is encoded
+once. Every subscriber has its own bounded queue and writer thread, so a slow
+or stalled client never blocks tracking or the other clients: when its queue
+is full the oldest events are dropped, and the client is told how many it
+missed with a {"type":"dropped","count":n} event. Closing the hub flushes
+what is still queued, waiting up to DRAIN_TIMEOUT seconds for slow clients.
+
+Addresses: "127.0.0.1:8765", "tcp://0.0.0.0:8765" or "unix:///tmp/gymbro.sock".
+
+    nc 127.0.0.1 8765
+    {"type":"hello","t":1760700000123,"exercise":"Bodyweight Squats"}
+    {"type":"stage","t":1760700001450,"stage":"down"}
+    {"type":"rep","t":1760700002010,"count":1,"exercise":"Bodyweight Squats"}
+"""
+import json
+import os
+import socket
+import stat
+import threading
+import time
+from collections import deque
+
+DEFAULT_ADDRESS = '127.0.0.1:8765'
+QUEUE_SIZE = 256
+DRAIN_TIMEOUT = 1.0
+
+
+def encode(event) -> bytes:
+    return (json.dumps(event, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def parse_address(address):
+    """
+    Returns (socket family, bind address) for an address string.
+    """
+    if address.startswith('unix://'):
+        return socket.AF_UNIX, address[len('unix://'):]
+    if address.startswith('tcp://'):
+        address = address[len('tcp://'):]
+    host, _, port = address.rpartition(':')
+    return socket.AF_INET, (host or '127.0.0.1', int(port))
+
+
+def remove_stale_socket(path):
+    """
+    Deletes a Unix socket left over from a crashed run. Raises FileExistsError
+    if `path` is not a socket or another process is still listening on it.
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"{path} exists and is not a socket; not replacing it.")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.unlink(path)  # nobody is listening
+        return
+    finally:
+        probe.close()
+    raise FileExistsError(f"Another process is already publishing on {path}.")
+
+
+class _Subscriber:
+    def __init__(self, conn, name, queue_size, on_close):
+        self.conn = conn
+        self.name = name
+        self.queue = deque(maxlen=queue_size)
+        self.dropped = 0
+        self.closed = False
+        self._unreported = 0
+        self._cond = threading.Condition()
+        self._on_close = on_close
+        self._thread = threading.Thread(target=self._write_loop, name=f"gymbro-events-{name}", daemon=True)
+        self._thread.start()
+
+    def put(self, data):
+        with self._cond:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+                self._unreported += 1
+            self.queue.append(data)
+            self._cond.notify()
+
+    def close(self):
+        """
+        Stops the writer once everything already queued has been sent.
+        """
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _write_loop(self):
+        try:
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self.queue or self.closed)
+                    closing = self.closed
+                    batch = b''.join(self.queue)
+                    self.queue.clear()
+                    if self._unreported:
+                        batch = encode({'type': 'dropped', 't': now_ms(), 'count': self._unreported}) + batch
+                        self._unreported = 0
+                if closing:
+                    self.conn.settimeout(DRAIN_TIMEOUT)  # don't let a stalled client hold up shutdown
+                if batch:
+                    self.conn.sendall(batch)
+                if closing:
+                    return
+        except OSError:
+            pass  # client went away
+        finally:
+            self.conn.close()
+            self._on_close(self)
+
+
+class EventHub:
+    def __init__(self, address=DEFAULT_ADDRESS, queue_size=QUEUE_SIZE, hello=None):
+        """
+        `hello` is an optional event sent to each client as soon as it connects.
+        """
+        self.address = address
+        self.queue_size = queue_size
+        self.hello = hello
+        self.published = 0
+        self._family, self._bind = parse_address(address)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def start(self):
+        if self._family == socket.AF_UNIX:
+            remove_stale_socket(self._bind)
+        self._server = socket.socket(self._family, socket.SOCK_STREAM)
+        if self._family == socket.AF_INET:
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(self._bind)
+        self._server.listen()
+        threading.Thread(target=self._accept_loop, name='gymbro-events-accept', daemon=True).start()
+        print(f"Publishing tracking events on {self.address}")
+
+    def _accept_loop(self):
+        count = 0
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return  # server closed
+            if self._family == socket.AF_INET:
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # events are tiny; don't wait to batch them
+            count += 1
+            subscriber = _Subscriber(conn, str(count), self.queue_size, self._remove)
+            if self.hello is not None:
+                subscriber.put(encode({**self.hello, 't': now_ms()}))
+            with self._lock:
+                self._subscribers.add(subscriber)
+
+    def _remove(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event_type, **fields):
+        """
+        Sends one event to every subscriber without blocking on any of them.
+        """
+        data = encode({'type': event_type, 't': now_ms(), **fields})
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put(data)
+        self.published += 1
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            if self._family == socket.AF_UNIX and os.path.exists(self._bind):
+                os.unlink(self._bind)
+        with self._lock:
+            subscribers, self._subscribers = list(self._subscribers), set()
+        for subscriber in subscribers:
+            subscriber.close()
+        # Writer threads are daemons; give them a moment to flush the final events
+        deadline = time.monotonic() + DRAIN_TIMEOUT
+        for subscriber in subscribers:
+            subscriber.join(max(0.0, deadline - time.monotonic()))
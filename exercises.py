@@ -0,0 +1,273 @@
+"""
+Declarative exercise registry and the per-frame rep/hold state machine.
+
+Each exercise is described once as data: which signal to watch (a joint angle
+or a landmark height), the thresholds that move it between its two stages, the
+feedback for each transition and, for timed holds, the angle range that counts
+as good form. An ExerciseTracker compiles that spec once per set and is then
+updated with one frame of landmark objects at a time, reading only the few
+landmarks the spec needs, or run over a whole (T, 33, 4) recording at once. It knows nothing about
+Streamlit, so the live coach, the command-line detector and offline jobs all
+share the same logic.
+"""
+import operator
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+import angles
+
+# Joints that must be clearly visible before any exercise is scored
+PRIMARY_JOINTS = (angles.LEFT_SHOULDER, angles.LEFT_HIP, angles.LEFT_KNEE, angles.RIGHT_KNEE, angles.LEFT_ANKLE, angles.RIGHT_ANKLE)
+
+_OPS = {'>': operator.gt, '<': operator.lt}
+
+NOT_VISIBLE = ("I can't see you clearly! Stand further back.", "warning")
+NO_POSE = ("Tracking... get into position.", "info")
+
+
+@dataclass(frozen=True)
+class ExerciseSpec:
+    """
+    One exercise. `match` is looked for in the plan's exercise name.
+
+    Rep exercises move to `ready_stage` when the signal passes `ready` and count
+    a rep when, from the ready stage, it passes `count`; the gap between the two
+    thresholds is the hysteresis band. `cue` is optional coaching feedback shown
+    while in the ready stage. Hold exercises accumulate time while the signal
+    stays inside `hold`.
+    """
+    name: str
+    match: str
+    signal: tuple                      # angle names (min-reduced), or ('height', landmark, reference)
+    ready_stage: str = 'up'
+    ready: tuple = None                # (op, threshold)
+    count_stage: str = 'down'
+    count: tuple = None                # (op, threshold)
+    ready_feedback: tuple = None       # (message, type)
+    count_feedback: tuple = None       # (message or None to keep the current one, type)
+    cue: tuple = None                  # (op, threshold, message, type)
+    hold: tuple = None                 # (low, high) exclusive range that counts as good form
+    hold_feedback: tuple = (("Great form! Hold it.", "success"), ("Straighten your back!", "warning"))
+    visible_joints: tuple = PRIMARY_JOINTS
+    min_visibility: float = 0.7
+
+
+EXERCISES = (
+    ExerciseSpec(
+        name='Bodyweight Squats', match='Squat', signal=('left_knee',),
+        ready=('>', 165), count=('<', 90),
+        ready_feedback=("Ready to squat.", "info"), count_feedback=("Good depth!", "success"),
+        cue=('>', 90, "Go lower!", "warning"),
+    ),
+    ExerciseSpec(
+        name='Lunges', match='Lunge', signal=('left_knee', 'right_knee'),
+        ready=('>', 160), count=('<', 100),
+        ready_feedback=("Ready to lunge.", "info"), count_feedback=("Great lunge!", "success"),
+    ),
+    ExerciseSpec(
+        name='Push-ups', match='Push-up', signal=('left_elbow',),
+        ready=('>', 160), count=('<', 90),
+        ready_feedback=("Ready.", "info"), count_feedback=("Great push!", "success"),
+    ),
+    ExerciseSpec(
+        name='Jumping Jacks', match='Jumping Jack', signal=('height', angles.LEFT_WRIST, angles.LEFT_SHOULDER),
+        ready_stage='down', ready=('<', 0), count_stage='up', count=('>', 0),
+        ready_feedback=("Jump!", "info"), count_feedback=(None, "success"),
+    ),
+    ExerciseSpec(
+        name='Plank', match='Plank', signal=('left_body',), hold=(155, 195),
+    ),
+)
+
+
+@lru_cache(maxsize=None)
+def resolve(exercise_name: str):
+    """
+    Finds the spec for a plan exercise name, or None if we can't track it.
+    """
+    for spec in EXERCISES:
+        if spec.match in exercise_name:
+            return spec
+    return None
+
+
+def normalize_plan(plan) -> list:
+    """
+    Sets each trackable plan entry's "type" to what its tracker measures:
+    "time" for holds, "reps" otherwise. A plan asking for "Jumping Jacks /
+    time / 30" becomes 30 reps, so the progress shown, the timer prompt and
+    the end of the set all agree. Entries we can't track are left alone.
+    """
+    normalized = []
+    for entry in plan:
+        spec = resolve(entry['exercise'])
+        if spec is not None:
+            entry = {**entry, 'type': 'time' if spec.hold is not None else 'reps'}
+        normalized.append(entry)
+    return normalized
+
+
+@lru_cache(maxsize=None)
+def _engine_for(spec: ExerciseSpec):
+    return None if spec.signal[0] == 'height' else angles.AngleEngine(spec.signal)
+
+
+class ExerciseTracker:
+    """
+    Per-set state machine for one exercise. `update()` returns True when any
+    value shown to the user changed, so callers only redraw on change.
+    """
+    __slots__ = ('spec', 'stage', 'counter', 'elapsed_time', 'timer_started', 'last_time',
+                 'feedback', 'feedback_type', 'rep_times', 'changed',
+                 '_engine', '_visible', '_visible_list', '_triplets', '_ready_op', '_ready_at', '_count_op', '_count_at', '_cue_op', '_cue_at')
+
+    def __init__(self, spec: ExerciseSpec, counter=0, stage=None, elapsed_time=0.0,
+                 feedback="Let's get started!", feedback_type="info"):
+        self.spec = spec
+        self.stage = stage
+        self.counter = counter
+        self.elapsed_time = elapsed_time
+        self.timer_started = False
+        self.last_time = 0.0
+        self.feedback = feedback
+        self.feedback_type = feedback_type
+        self.rep_times = []
+        self.changed = False
+        self._engine = _engine_for(spec)
+        self._visible = np.array(spec.visible_joints, dtype=np.intp)
+        self._visible_list = tuple(spec.visible_joints)
+        self._triplets = None if spec.signal[0] == 'height' else tuple(angles.JOINTS[name] for name in spec.signal)
+        self._ready_op, self._ready_at = (_OPS[spec.ready[0]], spec.ready[1]) if spec.ready else (None, None)
+        self._count_op, self._count_at = (_OPS[spec.count[0]], spec.count[1]) if spec.count else (None, None)
+        self._cue_op, self._cue_at = (_OPS[spec.cue[0]], spec.cue[1]) if spec.cue else (None, None)
+
+    # --- signals ---
+    def frame_signal(self, landmarks) -> float:
+        """
+        The watched value for one frame of landmark objects.
+        """
+        if self._triplets is None:
+            _, landmark, reference = self.spec.signal
+            return landmarks[reference].y - landmarks[landmark].y
+        value = None
+        for a, b, c in self._triplets:
+            angle = angles.joint_angle(landmarks[a], landmarks[b], landmarks[c])
+            if value is None or angle < value:
+                value = angle
+        return value
+
+    def frame_visible(self, landmarks) -> bool:
+        min_visibility = self.spec.min_visibility
+        for i in self._visible_list:
+            if not landmarks[i].visibility > min_visibility:
+                return False
+        return True
+
+    def signal(self, pts: np.ndarray):
+        """
+        The watched value for every frame of a (T, 33, 4) stack (or one (33, 4) frame).
+        """
+        if self._engine is None:
+            _, landmark, reference = self.spec.signal
+            return pts[..., reference, angles.Y] - pts[..., landmark, angles.Y]
+        return self._engine(pts).min(axis=-1)
+
+    def visible(self, pts: np.ndarray):
+        return (pts[..., self._visible, angles.VISIBILITY] > self.spec.min_visibility).all(axis=-1)
+
+    # --- state machine ---
+    def _set_feedback(self, feedback):
+        message, kind = feedback
+        if message is None:
+            message = self.feedback
+        if message != self.feedback or kind != self.feedback_type:
+            self.feedback, self.feedback_type = message, kind
+            self.changed = True
+
+    def _step(self, value, now, measured=True):
+        spec = self.spec
+        if spec.hold is not None:
+            low, high = spec.hold
+            if low < value < high:
+                if not self.timer_started:
+                    self.timer_started = True
+                    self.last_time = now
+                    self._set_feedback(spec.hold_feedback[0])
+                else:
+                    before = int(self.elapsed_time)
+                    self.elapsed_time += now - self.last_time
+                    self.last_time = now
+                    if int(self.elapsed_time) != before:
+                        self.changed = True
+            elif self.timer_started:
+                self.timer_started = False
+                self._set_feedback(spec.hold_feedback[1])
+            return
+
+        if self._ready_op(value, self._ready_at):
+            if self.stage != spec.ready_stage:
+                self.stage = spec.ready_stage
+                self.changed = True
+            self._set_feedback(spec.ready_feedback)
+        elif self.stage == spec.ready_stage:
+            if self._count_op(value, self._count_at):
+                # Predicted frames never complete a rep; the next measured frame has to confirm it
+                if measured:
+                    self.stage = spec.count_stage
+                    self.counter += 1
+                    self.rep_times.append(now)
+                    self.changed = True
+                    self._set_feedback(spec.count_feedback)
+            elif self._cue_op is not None and self._cue_op(value, self._cue_at):
+                self._set_feedback(spec.cue[2:])
+
+    def update(self, landmarks, now: float, measured=True) -> bool:
+        """
+        Advances the state machine with one frame: MediaPipe's landmark list or
+        any sequence of objects with .x/.y/.z/.visibility (see angles.Landmark).
+        Pass measured=False for extrapolated landmarks.
+        """
+        self.changed = False
+        if not self.frame_visible(landmarks):
+            self._set_feedback(NOT_VISIBLE)
+        else:
+            self._step(self.frame_signal(landmarks), now, measured)
+        return self.changed
+
+    def lost(self) -> bool:
+        """
+        Call when no pose was detected in the frame.
+        """
+        self.changed = False
+        self._set_feedback(NO_POSE)
+        return self.changed
+
+    def run(self, timestamps, pts: np.ndarray):
+        """
+        Feeds a whole (T, 33, 4) recording through the state machine. Signals and
+        visibility are computed for all frames in one vectorized pass; frames
+        without a pose should be NaN.
+        """
+        signal = self.signal(pts).tolist()
+        visible = self.visible(pts).tolist()
+        for now, value, ok in zip(timestamps, signal, visible):
+            if ok:
+                self._step(value, now)
+        return self
+
+    def progress(self):
+        return self.counter if self.spec.hold is None else self.elapsed_time
+
+    def sync(self, state):
+        """
+        Copies the user-visible fields onto a session_state-like object.
+        """
+        state.stage = self.stage
+        state.counter = self.counter
+        state.elapsed_time = self.elapsed_time
+        state.timer_started = self.timer_started
+        state.last_time = self.last_time
+        state.feedback = self.feedback
+        state.feedback_type = self.feedback_type
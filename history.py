@@ -0,0 +1,183 @@
+"""
+Persistent workout history and daily habits.
+
+Every finished set is stored as a structured row (exercise, reps or seconds,
+timestamps, goal) in a small SQLite file, indexed by user and day. Daily and
+weekly totals are updated in the same transaction as each insert, so the
+dashboard reads a handful of precomputed rows instead of scanning a user's
+whole history, and recent sets are paged with a keyset cursor. Water and
+steps are kept per user per day.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+DEFAULT_PATH = os.environ.get('GYMBRO_HISTORY', 'gymbro_history.sqlite3')
+DEFAULT_USER = 'me'
+
+SetRecord = namedtuple('SetRecord', ['id', 'workout_id', 'goal', 'exercise', 'kind', 'target', 'reps', 'seconds', 'started_at', 'finished_at'])
+Rollup = namedtuple('Rollup', ['period', 'sets', 'workouts', 'reps', 'seconds', 'active_days'])
+
+
+def day_of(timestamp) -> str:
+    return datetime.fromtimestamp(timestamp).date().isoformat()
+
+
+def week_of(day: str) -> str:
+    year, week, _ = date.fromisoformat(day).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+class HistoryStore:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sets (
+                id INTEGER PRIMARY KEY,
+                user TEXT NOT NULL,
+                day TEXT NOT NULL,
+                workout_id TEXT NOT NULL,
+                goal TEXT NOT NULL,
+                exercise TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                target INTEGER NOT NULL,
+                reps INTEGER NOT NULL,
+                seconds REAL NOT NULL,
+                started_at REAL NOT NULL,
+                finished_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sets_user_day ON sets (user, day);
+            CREATE INDEX IF NOT EXISTS sets_user_id ON sets (user, id);
+            CREATE TABLE IF NOT EXISTS daily (
+                user TEXT NOT NULL,
+                day TEXT NOT NULL,
+                sets INTEGER NOT NULL DEFAULT 0,
+                workouts INTEGER NOT NULL DEFAULT 0,
+                reps INTEGER NOT NULL DEFAULT 0,
+                seconds REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (user, day)
+            );
+            CREATE TABLE IF NOT EXISTS weekly (
+                user TEXT NOT NULL,
+                week TEXT NOT NULL,
+                sets INTEGER NOT NULL DEFAULT 0,
+                workouts INTEGER NOT NULL DEFAULT 0,
+                reps INTEGER NOT NULL DEFAULT 0,
+                seconds REAL NOT NULL DEFAULT 0,
+                active_days INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user, week)
+            );
+            CREATE TABLE IF NOT EXISTS habits (
+                user TEXT NOT NULL,
+                day TEXT NOT NULL,
+                water_ml INTEGER NOT NULL DEFAULT 0,
+                steps INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user, day)
+            );
+        """)
+
+    def _roll_up(self, user, day, sets=0, workouts=0, reps=0, seconds=0.0):
+        """
+        Adds to the daily and weekly totals; must run inside a transaction.
+        """
+        new_day = self._conn.execute("SELECT 1 FROM daily WHERE user = ? AND day = ?", (user, day)).fetchone() is None
+        self._conn.execute("""
+            INSERT INTO daily (user, day, sets, workouts, reps, seconds) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(user, day) DO UPDATE SET sets = sets + excluded.sets, workouts = workouts + excluded.workouts,
+                reps = reps + excluded.reps, seconds = seconds + excluded.seconds""",
+            (user, day, sets, workouts, reps, seconds))
+        self._conn.execute("""
+            INSERT INTO weekly (user, week, sets, workouts, reps, seconds, active_days) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(user, week) DO UPDATE SET sets = sets + excluded.sets, workouts = workouts + excluded.workouts,
+                reps = reps + excluded.reps, seconds = seconds + excluded.seconds, active_days = active_days + excluded.active_days""",
+            (user, week_of(day), sets, workouts, reps, seconds, int(new_day)))
+
+    def add_set(self, user, workout_id, goal, exercise, kind, target, reps, seconds, started_at, finished_at=None) -> int:
+        finished_at = time.time() if finished_at is None else finished_at
+        day = day_of(finished_at)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                row_id = self._conn.execute("""
+                    INSERT INTO sets (user, day, workout_id, goal, exercise, kind, target, reps, seconds, started_at, finished_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (user, day, workout_id, goal, exercise, kind, int(target), int(reps), float(seconds), started_at, finished_at)).lastrowid
+                self._roll_up(user, day, sets=1, reps=int(reps), seconds=float(seconds))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row_id
+
+    def complete_workout(self, user, finished_at=None):
+        day = day_of(time.time() if finished_at is None else finished_at)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._roll_up(user, day, workouts=1)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def recent_sets(self, user, limit=20, before_id=None) -> list:
+        """
+        Newest sets first. Pass the id of the last set of a page as `before_id`
+        to get the next page; cost depends only on `limit`, not on history size.
+        """
+        query = "SELECT id, workout_id, goal, exercise, kind, target, reps, seconds, started_at, finished_at FROM sets WHERE user = ?"
+        args = [user]
+        if before_id is not None:
+            query += " AND id < ?"
+            args.append(before_id)
+        query += " ORDER BY id DESC LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            return [SetRecord(*row) for row in self._conn.execute(query, args).fetchall()]
+
+    def daily(self, user, days=14, today=None) -> list:
+        """
+        Daily rollups for the last `days` days (only days with activity), oldest first.
+        """
+        today = today or date.today()
+        since = (today - timedelta(days=days - 1)).isoformat()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT day, sets, workouts, reps, seconds FROM daily WHERE user = ? AND day >= ? ORDER BY day",
+                (user, since)).fetchall()
+        return [Rollup(day, sets, workouts, reps, seconds, 1) for day, sets, workouts, reps, seconds in rows]
+
+    def week(self, user, day=None) -> Rollup:
+        week = week_of(day or date.today().isoformat())
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sets, workouts, reps, seconds, active_days FROM weekly WHERE user = ? AND week = ?",
+                (user, week)).fetchone()
+        return Rollup(week, *(row or (0, 0, 0, 0.0, 0)))
+
+    def habits(self, user, day=None) -> tuple:
+        """
+        (water_ml, steps) logged for `day` (default today).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT water_ml, steps FROM habits WHERE user = ? AND day = ?",
+                (user, day or date.today().isoformat())).fetchone()
+        return row or (0, 0)
+
+    def set_habits(self, user, water_ml, steps, day=None):
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO habits (user, day, water_ml, steps) VALUES (?, ?, ?, ?)
+                ON CONFLICT(user, day) DO UPDATE SET water_ml = excluded.water_ml, steps = excluded.steps""",
+                (user, day or date.today().isoformat(), int(water_ml), int(steps)))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,112 @@
+"""
+Persistent, size-bounded cache for model responses.
+
+Every plan, nutrition tip and motivation line costs seconds of CPU on a local
+model, and most users ask for the same few goals. Responses are stored in a
+small SQLite file keyed by model, prompt template version and normalized
+inputs, so they survive restarts. Entries expire after a TTL and the least
+recently used ones are evicted once the cache is full. Hit/miss counters are
+kept in the same file.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = os.environ.get('GYMBRO_LLM_CACHE', '.llm_cache.sqlite3')
+DEFAULT_MAX_ENTRIES = 500
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+def normalize_text(text: str) -> str:
+    """
+    Case- and whitespace-folds free text so "Build  Muscle " and "build muscle" match.
+    """
+    return ' '.join(str(text).casefold().split())
+
+
+def bucket(value: float, step: float) -> int:
+    """
+    Rounds a body stat to the nearest `step`, e.g. 72.4kg -> 70 with step 5.
+    """
+    return int(round(float(value) / step) * step)
+
+
+def make_key(model: str, namespace: str, version: int, *inputs) -> str:
+    raw = json.dumps([model, namespace, version, *inputs], separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path=DEFAULT_PATH, max_entries=DEFAULT_MAX_ENTRIES, default_ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _count(self, name):
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,))
+
+    def get(self, key):
+        """
+        Returns the cached value, or None on a miss or an expired entry.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._count('misses')
+                return None
+            self._conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+            self._count('hits')
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires_at = now + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now))
+            self._evict(now)
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM entries WHERE expires_at < ?", (now,))
+        excess = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_used LIMIT ?)",
+                (excess,))
+            self._conn.execute(
+                "INSERT INTO counters (name, value) VALUES ('evictions', ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+                (excess, excess))
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+            stats['entries'] = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        for name in ('hits', 'misses', 'evictions'):
+            stats.setdefault(name, 0)
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM counters")
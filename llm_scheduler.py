@@ -0,0 +1,154 @@
+"""
+Shared scheduler in front of the local model.
+
+Every Streamlit session talks to the same Ollama server, which can only run
+a couple of generations at once. LLMScheduler caps concurrent generations,
+hands free slots to the most urgent waiting request first (plan before
+nutrition before motivation), merges identical in-flight prompts into one
+generation, and gives up on requests that waited in the queue past their
+deadline so callers can fall back to canned text instead.
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+
+from telemetry import METRICS
+
+# Lower runs first
+PRIORITY_PLAN = 0
+PRIORITY_NUTRITION = 1
+PRIORITY_MOTIVATION = 2
+
+MAX_CONCURRENT = int(os.environ.get('GYMBRO_LLM_CONCURRENCY', 2))
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class TokenStream:
+    """
+    Text produced on a background thread, readable while it is still being
+    generated. Iterating yields every chunk from the start (so a late reader
+    catches up instantly) and then each new chunk as it arrives, and re-raises
+    the producer's error at the end; result() waits for the whole text like
+    Future.result().
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._done = False
+        self._error = None
+        self._cond = threading.Condition()
+
+    def feed(self, chunk):
+        with self._cond:
+            self._chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self._done = True
+            self._error = error
+            self._cond.notify_all()
+
+    def done(self) -> bool:
+        return self._done
+
+    def __iter__(self):
+        i = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: i < len(self._chunks) or self._done)
+                chunks = self._chunks[i:]
+                if not chunks and self._done:
+                    if self._error is not None:
+                        raise self._error
+                    return
+            i += len(chunks)
+            yield from chunks
+
+    def result(self, timeout=None) -> str:
+        with self._cond:
+            self._cond.wait_for(lambda: self._done, timeout)
+            if self._error is not None:
+                raise self._error
+            return ''.join(self._chunks)
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrent=MAX_CONCURRENT):
+        self.max_concurrent = max_concurrent
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = []  # heap of (priority, ticket)
+        self._tickets = itertools.count()
+        self._in_flight = {}
+        self.deduplicated = 0
+        self.expired = 0
+
+    def stream(self, key, priority, generate, deadline=None) -> TokenStream:
+        """
+        Runs `generate()` (which returns an iterator of text chunks) once a
+        generation slot is free and returns its TokenStream. A request with the
+        same `key` that is already queued or running is shared instead of
+        started again. If no slot frees up within `deadline` seconds the stream
+        raises DeadlineExceeded.
+        """
+        with self._cond:
+            stream = self._in_flight.get(key)
+            if stream is not None:
+                self.deduplicated += 1
+                METRICS.count('llm.deduplicated')
+                return stream
+            stream = self._in_flight[key] = TokenStream()
+        threading.Thread(target=self._produce, args=(key, priority, generate, deadline, stream),
+                         name='gymbro-llm-generate', daemon=True).start()
+        return stream
+
+    def run(self, key, priority, generate, deadline=None) -> str:
+        return self.stream(key, priority, generate, deadline).result()
+
+    def _produce(self, key, priority, generate, deadline, stream):
+        queued_at = time.perf_counter()
+        error = None
+        try:
+            self._acquire(priority, None if deadline is None else queued_at + deadline)
+            METRICS.record('llm.queue_wait', time.perf_counter() - queued_at)
+            try:
+                for chunk in generate():
+                    stream.feed(chunk)
+            finally:
+                self._release()
+        except Exception as e:
+            error = e
+        finally:
+            with self._cond:
+                del self._in_flight[key]
+            stream.finish(error)
+
+    def _acquire(self, priority, expires_at):
+        with self._cond:
+            entry = (priority, next(self._tickets))
+            heapq.heappush(self._waiting, entry)
+            while not (self._active < self.max_concurrent and self._waiting[0] == entry):
+                timeout = None if expires_at is None else expires_at - time.perf_counter()
+                if timeout is not None and timeout <= 0:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                    self.expired += 1
+                    METRICS.count('llm.deadline_expired')
+                    raise DeadlineExceeded(f"No model slot free after waiting past the deadline (priority {priority}).")
+                self._cond.wait(timeout)
+            heapq.heappop(self._waiting)
+            self._active += 1
+            self._cond.notify_all()  # the next waiter may fit in a remaining slot
+            METRICS.gauge('llm.queue_depth', len(self._waiting))
+
+    def _release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
@@ -0,0 +1,102 @@
+"""
+Adaptive pose inference: run the model only when the picture changed.
+
+MotionGate compares a tiny grayscale thumbnail of each camera frame with the
+thumbnail of the last frame that went through pose estimation. Inference runs
+when the mean pixel difference passes a threshold, and at least every
+`max_skip` frames so a slow drift or a held plank is still checked. Frames
+in between get landmarks from LandmarkPredictor, which extrapolates the last
+two measurements, scaled by how much the picture actually changed: a skipped
+frame means little moved, so someone who stopped is held where they stopped. The rep state machines see a frame of
+landmarks on every frame either way, so fast jumping jacks are tracked at the full
+camera rate while a motionless plank costs a fraction of the inference.
+"""
+import os
+
+import cv2
+import numpy as np
+
+import angles
+
+MOTION_THRESHOLD = float(os.environ.get('GYMBRO_MOTION_THRESHOLD', 3.0))
+MAX_SKIP = int(os.environ.get('GYMBRO_MAX_SKIP', 5))
+
+
+class MotionGate:
+    def __init__(self, threshold=MOTION_THRESHOLD, max_skip=MAX_SKIP, size=(64, 48)):
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.size = size
+        self.score = 0.0
+        self.skipped = 0
+        self.inferred = 0
+        self._reference = None
+        self._thumb = None
+
+    def _thumbnail(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+    def should_infer(self, frame) -> bool:
+        """
+        Decides whether `frame` needs pose estimation. Frames that don't are counted as skipped.
+        """
+        self._thumb = self._thumbnail(frame)
+        if self._reference is None:
+            self.score = float('inf')
+        else:
+            self.score = float(cv2.absdiff(self._thumb, self._reference).mean())
+        if self.score >= self.threshold or self.skipped >= self.max_skip:
+            self._reference = self._thumb
+            self.skipped = 0
+            self.inferred += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def reset(self):
+        self._reference = None
+        self.skipped = 0
+
+
+class LandmarkPredictor:
+    """
+    Constant-velocity extrapolation of a frame of landmarks. Visibility is
+    carried over unchanged. Predictions stop `max_horizon` seconds past the
+    last measurement, and a missing pose clears the history so nothing is
+    invented for an empty frame. Measured frames are only stored; they are
+    converted to arrays when a prediction is actually needed, so frames that
+    go through the model pay nothing extra.
+    """
+
+    def __init__(self, max_horizon=0.25, max_gap=0.5):
+        self.max_horizon = max_horizon
+        self.max_gap = max_gap
+        self._last = self._previous = None
+        self._last_t = self._previous_t = 0.0
+        self._base = None      # (33, 4) array of the last measurement, built on first predict()
+        self._velocity = None  # (33, 3) units per second
+
+    def observe(self, landmarks, t):
+        self._previous, self._previous_t = self._last, self._last_t
+        self._last, self._last_t = landmarks, t
+        self._base = None
+
+    def predict(self, t, motion=1.0):
+        """
+        Predicted landmarks (a list of angles.Landmark) at time `t`, or None
+        when there is no recent measurement. `motion` in [0, 1] scales the
+        velocity; 0 holds the last measurement.
+        """
+        if self._last is None:
+            return None
+        if self._base is None:
+            self._base = angles.landmarks_to_array(self._last)
+            gap = self._last_t - self._previous_t
+            if self._previous is not None and 0 < gap <= self.max_gap:
+                self._velocity = (self._base[:, :3] - angles.landmarks_to_array(self._previous)[:, :3]) / gap
+            else:
+                self._velocity = np.zeros((angles.NUM_LANDMARKS, 3), dtype=np.float32)
+        out = self._base.copy()
+        out[:, :3] += self._velocity * (motion * min(max(t - self._last_t, 0.0), self.max_horizon))
+        return angles.array_to_landmarks(out)
@@ -0,0 +1,253 @@
+"""
+Camera -> pose inference -> render pipeline for the live workout loop.
+
+SequentialSource is the original single-threaded loop (read, infer, render on
+the caller's thread). PosePipeline splits capture and inference into their own
+threads, connected by single-slot queues that only ever hold the newest frame,
+so stale frames are dropped as soon as a newer one arrives. Rendering stays on
+the caller's thread because Streamlit widgets must be updated from the script
+thread.
+
+Both sources run the pose model only when motion.MotionGate says the frame
+changed, and fill the frames in between with motion.LandmarkPredictor, so
+every PoseFrame carries a frame of landmarks (or None when nobody is in view)
+and a `predicted` flag.
+
+`pose_factory()` must return a context manager that yields the pose model:
+an mp_pose.Pose, or a lease on a shared one from resources.py.
+"""
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+
+import motion
+from telemetry import METRICS
+
+PoseFrame = namedtuple('PoseFrame', ['image', 'landmarks', 'captured_at', 'predicted'])
+
+
+def _infer(pose, frame):
+    """
+    Mirror the camera frame, run pose estimation and return (BGR image, results).
+    """
+    image = cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB)
+    image.flags.writeable = False
+    results = pose.process(image)
+    image.flags.writeable = True
+    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    return image, results
+
+
+class _AdaptiveInference:
+    """
+    Motion gate plus landmark predictor shared by both sources.
+    """
+
+    def __init__(self, gate=None, predictor=None):
+        self.gate = gate or motion.MotionGate()
+        self.predictor = predictor or motion.LandmarkPredictor()
+        self.predicted = 0
+
+    def __call__(self, pose, frame, captured_at):
+        if self.gate.should_infer(frame):
+            with METRICS.stage('inference'):
+                image, results = _infer(pose, frame)
+            landmarks = None if results.pose_landmarks is None else results.pose_landmarks.landmark
+            self.predictor.observe(landmarks, captured_at)
+            return PoseFrame(image, landmarks, captured_at, False)
+        with METRICS.stage('predict'):
+            # Skipped frames changed less than the threshold; extrapolate only that much of the motion
+            landmarks = self.predictor.predict(captured_at, min(self.gate.score / self.gate.threshold, 1.0))
+        self.predicted += 1
+        METRICS.gauge('frames.predicted', self.predicted)
+        METRICS.gauge('motion.score', round(self.gate.score, 2))
+        return PoseFrame(cv2.flip(frame, 1), landmarks, captured_at, True)
+
+
+class LatestQueue:
+    """
+    Bounded handoff between two threads that keeps only the newest item.
+    Putting into a full queue replaces the old item and counts it as dropped.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._full = False
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._full:
+                self.dropped += 1
+            self._item = item
+            self._full = True
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """
+        Returns the newest item, or None on timeout or once the queue is closed.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._full or self._closed, timeout)
+            if not self._full:
+                return None
+            item, self._item, self._full = self._item, None, False
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class SequentialSource:
+    """
+    Original behaviour: capture and inference on the caller's thread.
+    """
+
+    def __init__(self, cap, pose_factory, gate=None, predictor=None):
+        self.cap = cap
+        self.pose_factory = pose_factory
+        self.adaptive = _AdaptiveInference(gate, predictor)
+        self._pose_context = None
+        self._pose = None
+        self.dropped = 0
+
+    def __enter__(self):
+        self._pose_context = self.pose_factory()
+        self._pose = self._pose_context.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self._pose_context.__exit__(*exc)
+        return False
+
+    def frames(self):
+        while self.cap.isOpened():
+            with METRICS.stage('capture'):
+                success, frame = self.cap.read()
+            if not success: break
+            yield self.adaptive(self._pose, frame, time.perf_counter())
+
+
+class PosePipeline:
+    """
+    Runs capture and pose inference on background threads.
+
+    The capture thread reads the camera as fast as it delivers frames and
+    overwrites the pending frame. The inference worker always takes the newest
+    frame and skips it if it is already older than the measured capture
+    interval plus inference latency, which means a fresher frame is on its way.
+    `frames()` yields finished PoseFrames on the caller's thread for rendering.
+    """
+
+    def __init__(self, cap, pose_factory, smoothing=0.1, gate=None, predictor=None):
+        self.cap = cap
+        self.pose_factory = pose_factory
+        self.smoothing = smoothing
+        self.adaptive = _AdaptiveInference(gate, predictor)
+        self.stale_dropped = 0
+        self.frame_interval = 0.0   # EMA of seconds between camera frames
+        self.latency = 0.0          # EMA of seconds from capture to inference result
+        self._frames = LatestQueue()
+        self._results = LatestQueue()
+        self._running = threading.Event()
+        self._capture_done = threading.Event()
+        self._inference_done = threading.Event()
+        self._error = None
+        self._threads = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    @property
+    def dropped(self):
+        """
+        Total frames that never reached the renderer.
+        """
+        return self._frames.dropped + self._results.dropped + self.stale_dropped
+
+    def start(self):
+        self._running.set()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name='gymbro-capture', daemon=True),
+            threading.Thread(target=self._inference_loop, name='gymbro-inference', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._running.clear()
+        self._frames.close()
+        self._results.close()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        self._threads = []
+
+    def frames(self):
+        """
+        Yields PoseFrames until the camera runs out or the pipeline stops.
+        Re-raises the inference thread's exception if it failed.
+        """
+        while self._running.is_set():
+            item = self._results.get(timeout=0.5)
+            if item is None:
+                if self._capture_done.is_set() or self._inference_done.is_set():
+                    break
+                continue
+            yield item
+        if self._error is not None:
+            raise self._error
+
+    def _ema(self, current, sample):
+        return sample if current == 0.0 else current + self.smoothing * (sample - current)
+
+    def _capture_loop(self):
+        last = None
+        try:
+            while self._running.is_set() and not self._inference_done.is_set() and self.cap.isOpened():
+                with METRICS.stage('capture'):
+                    success, frame = self.cap.read()
+                if not success: break
+                now = time.perf_counter()
+                if last is not None:
+                    self.frame_interval = self._ema(self.frame_interval, now - last)
+                last = now
+                self._frames.put((now, frame))
+        finally:
+            self._capture_done.set()
+            self._frames.close()
+
+    def _inference_loop(self):
+        try:
+            with self.pose_factory() as pose:
+                while self._running.is_set():
+                    item = self._frames.get(timeout=0.5)
+                    if item is None:
+                        if self._capture_done.is_set():
+                            break
+                        continue
+                    captured_at, frame = item
+                    if self.latency and time.perf_counter() - captured_at > self.frame_interval + self.latency:
+                        self.stale_dropped += 1
+                        continue
+                    pose_frame = self.adaptive(pose, frame, captured_at)
+                    if not pose_frame.predicted:
+                        self.latency = self._ema(self.latency, time.perf_counter() - captured_at)
+                    self._results.put(pose_frame)
+        except Exception as e:
+            self._error = e  # handed to the caller by frames()
+        finally:
+            # Set before closing so frames() sees it as soon as get() returns
+            self._inference_done.set()
+            self._frames.close()
+            self._results.close()
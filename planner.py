@@ -1,15 +1,179 @@
 import ollama
 import json
+import os
 import re
+import threading
+import time
+import llm_cache
+import llm_scheduler
+from llm_scheduler import TokenStream
+from telemetry import METRICS
+from concurrent.futures import Future
 
 # Explicitly define the client to connect to the default Ollama server
 client = ollama.Client(host='http://127.0.0.1:11434')
 
+MODEL = 'gemma:2b'
+
+# How long Ollama keeps the model in memory after a request ("30m", "-1" = forever)
+KEEP_ALIVE = os.environ.get('GYMBRO_KEEP_ALIVE', '30m')
+# Unload an idle model once available memory drops below this many MB
+UNLOAD_BELOW_MB = int(os.environ.get('GYMBRO_UNLOAD_BELOW_MB', 1024))
+UNLOAD_IDLE_S = 120
+
+# Bump a version whenever its prompt changes so stale cached answers are ignored
+PLAN_PROMPT_VERSION = 1
+NUTRITION_PROMPT_VERSION = 1
+MOTIVATION_PROMPT_VERSION = 1
+
+# Responses survive restarts; popular goals are answered without touching the model
+cache = llm_cache.LLMCache()
+# Motivation should feel fresh, so it is only reused for a day
+MOTIVATION_TTL = 24 * 3600
+
+# One scheduler per process: sessions share the model slots, urgent requests go
+# first and optional ones give up after waiting this long in the queue
+scheduler = llm_scheduler.LLMScheduler()
+NUTRITION_DEADLINE_S = 20
+MOTIVATION_DEADLINE_S = 8
+
+# Each background task gets its own thread and only waits on the scheduler, which
+# limits the real load on the model. A bounded FIFO pool in front of it would make
+# an urgent plan queue behind long nutrition and motivation streams.
+def _start(target, name):
+    threading.Thread(target=target, name=name, daemon=True).start()
+
+def submit(fn, *args) -> Future:
+    """
+    Runs one of the planner functions in the background and returns its Future.
+    """
+    future = Future()
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+    _start(run, 'gymbro-llm-task')
+    return future
+
+def submit_stream(stream_fn, *args) -> TokenStream:
+    """
+    Runs one of the stream_* generators in the background; the returned
+    TokenStream can be handed straight to st.write_stream.
+    """
+    stream = TokenStream()
+    def produce():
+        try:
+            for chunk in stream_fn(*args):
+                stream.feed(chunk)
+        finally:
+            stream.finish()
+    _start(produce, 'gymbro-llm-stream')
+    return stream
+
+# --- MODEL LIFECYCLE ---
+# Loading gemma from disk is the slowest moment of the whole app, so the model
+# is loaded at startup and kept resident between requests for KEEP_ALIVE.
+# If the machine runs low on memory while the model is idle it is unloaded;
+# the next request simply loads it again.
+_in_flight = 0
+_last_used = time.monotonic()
+_usage_lock = threading.Lock()
+_monitor_started = False
+
+class _using_model:
+    def __enter__(self):
+        global _in_flight
+        with _usage_lock:
+            _in_flight += 1
+
+    def __exit__(self, *exc):
+        global _in_flight, _last_used
+        with _usage_lock:
+            _in_flight -= 1
+            _last_used = time.monotonic()
+        return False
+
+def _chat(stage, prompt, priority, deadline=None, **kwargs) -> TokenStream:
+    """
+    Streams a chat completion through the scheduler, keeping the model loaded.
+    Identical prompts in flight share one generation. Records latency and the
+    time to first token, queueing included, because that is what users notice.
+    """
+    submitted = time.perf_counter()
+    def generate():
+        first = True
+        with METRICS.stage(stage), _using_model():
+            for chunk in client.chat(model=MODEL, messages=[{'role': 'user', 'content': prompt}], stream=True, keep_alive=KEEP_ALIVE, **kwargs):
+                if first:
+                    METRICS.record(f"{stage}.first_token", time.perf_counter() - submitted)
+                    first = False
+                yield chunk['message']['content']
+    key = (stage, prompt, tuple(sorted(kwargs.items())))
+    return scheduler.stream(key, priority, generate, deadline)
+
+def memory_available_mb():
+    """
+    MemAvailable from /proc/meminfo in MB, or None where that isn't available.
+    """
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+def unload_model():
+    try:
+        client.generate(model=MODEL, prompt='', keep_alive=0)
+        print(f"Unloaded {MODEL} to free memory.")
+    except Exception as e:
+        print(f"Could not unload {MODEL}: {e}")
+
+def _monitor_memory(interval=15):
+    loaded = True
+    while True:
+        time.sleep(interval)
+        with _usage_lock:
+            idle = _in_flight == 0 and time.monotonic() - _last_used > UNLOAD_IDLE_S
+            if not idle:
+                loaded = True  # any request reloads the model
+        available = memory_available_mb()
+        if loaded and idle and available is not None and available < UNLOAD_BELOW_MB:
+            unload_model()
+            loaded = False
+
+def warm_up() -> Future:
+    """
+    Loads and pins the model in the background (an empty prompt only loads it)
+    and starts the low-memory unloader. Safe to call more than once.
+    """
+    global _monitor_started
+    if not _monitor_started:
+        _monitor_started = True
+        threading.Thread(target=_monitor_memory, name='gymbro-llm-memory', daemon=True).start()
+    def load():
+        try:
+            with METRICS.stage('llm.load'), _using_model():
+                client.generate(model=MODEL, prompt='', keep_alive=KEEP_ALIVE)
+        except Exception as e:
+            print(f"Could not preload {MODEL}: {e}")
+    return submit(load)
+
 def get_workout_plan(goal: str) -> list:
     """
     Generates a goal-specific, structured workout plan using Gemma.
     Selects from a known list of trackable exercises.
     """
+    key = llm_cache.make_key(MODEL, 'plan', PLAN_PROMPT_VERSION, llm_cache.normalize_text(goal))
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
     # FIX: Added 'Lunges' to the list of known exercises
     known_exercises = "'Bodyweight Squats', 'Push-ups', 'Plank', 'Jumping Jacks', 'Lunges'"
     
@@ -28,17 +192,13 @@ def get_workout_plan(goal: str) -> list:
     The JSON must be a list of objects, each with three keys: "exercise", "type" ("reps" or "time"), and "target" (an integer).
     """
     try:
-        response = client.chat(
-            model='gemma:2b',
-            messages=[{'role': 'user', 'content': prompt}],
-            format='json'
-        )
-        content = response['message']['content']
+        content = _chat('llm.plan', prompt, llm_scheduler.PRIORITY_PLAN, format='json').result()
         match = re.search(r'\[.*\]', content, re.DOTALL)
         if match:
             json_string = match.group(0)
             workout_plan = json.loads(json_string)
             if workout_plan:
+                cache.set(key, workout_plan)
                 return workout_plan
         raise ValueError("Failed to generate a valid plan from AI.")
     except Exception as e:
@@ -50,9 +210,21 @@ def get_workout_plan(goal: str) -> list:
         ]
 
 def get_nutrition_advice(goal: str, age: int, weight: float, height: float) -> str:
+    return ''.join(stream_nutrition_advice(goal, age, weight, height))
+
+def stream_nutrition_advice(goal: str, age: int, weight: float, height: float):
     """
-    Generates simple, goal-oriented nutrition advice using Gemma.
+    Generates simple, goal-oriented nutrition advice using Gemma, yielding it chunk by chunk.
+    Body stats are bucketed so similar users share a cached answer.
     """
+    goal = llm_cache.normalize_text(goal)
+    age, weight, height = llm_cache.bucket(age, 5), llm_cache.bucket(weight, 5), llm_cache.bucket(height, 5)
+    key = llm_cache.make_key(MODEL, 'nutrition', NUTRITION_PROMPT_VERSION, goal, age, weight, height)
+    cached = cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
     prompt = f"""
     You are GYM BRO, an expert AI fitness coach.
     A user's stats are: Age({age}), Weight({weight}kg), Height({height}cm).
@@ -63,12 +235,43 @@ def get_nutrition_advice(goal: str, age: int, weight: float, height: float) -> s
     - If the goal is 'general fitness', suggest a balanced diet.
     Make the advice encouraging, easy to understand, and focused on food types.
     """
+    chunks = []
     try:
-        response = client.chat(
-            model='gemma:2b',
-            messages=[{'role': 'user', 'content': prompt}]
-        )
-        return response['message']['content']
+        for chunk in _chat('llm.nutrition', prompt, llm_scheduler.PRIORITY_NUTRITION, NUTRITION_DEADLINE_S):
+            chunks.append(chunk)
+            yield chunk
+        cache.set(key, ''.join(chunks))
     except Exception as e:
         print(f"An error occurred in the nutrition planner: {e}")
-        return "Focus on a balanced diet rich in lean proteins, vegetables, and whole grains. Staying hydrated is also key!"
\ No newline at end of file
+        if not chunks:
+            yield "Focus on a balanced diet rich in lean proteins, vegetables, and whole grains. Staying hydrated is also key!"
+
+def get_ai_motivation(goal: str, exercise: str, progress: str, set_num: int, total_sets: int) -> str:
+    return ''.join(stream_ai_motivation(goal, exercise, progress, set_num, total_sets))
+
+def stream_ai_motivation(goal: str, exercise: str, progress: str, set_num: int, total_sets: int):
+    """
+    Generates a one-sentence motivational message after a set using Gemma, yielding it chunk by chunk.
+    """
+    key = llm_cache.make_key(MODEL, 'motivation', MOTIVATION_PROMPT_VERSION, llm_cache.normalize_text(goal), exercise, progress, set_num, total_sets)
+    cached = cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    prompt = f"""
+    The user's goal is to '{goal}'.
+    They just finished set {set_num} of {total_sets}, completing {progress} of {exercise}.
+    Write one short, powerful, encouraging sentence that connects this specific achievement to their main goal.
+    Sound like an enthusiastic gym buddy. Don't be generic.
+    """
+    chunks = []
+    try:
+        for chunk in _chat('llm.motivation', prompt, llm_scheduler.PRIORITY_MOTIVATION, MOTIVATION_DEADLINE_S):
+            chunks.append(chunk)
+            yield chunk
+        cache.set(key, ''.join(chunks), ttl=MOTIVATION_TTL)
+    except Exception as e:
+        print(f"AI Motivation Error: {e}")
+        if not chunks:
+            yield "Great work! Keep pushing."
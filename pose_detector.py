@@ -1,93 +1,140 @@
+"""
+Standalone webcam rep counter.
+
+    python pose_detector.py                               # window with the rep count
+    python pose_detector.py --serve 127.0.0.1:8765 --headless
+    python pose_detector.py --serve unix:///tmp/gymbro.sock --exercise Plank
+
+With --serve, rep, stage, feedback and hold events are published as NDJSON
+to every client connected to the socket (see events.py). --headless skips
+the preview window so the tracker can run as a background service.
+"""
+import argparse
 import cv2
 import mediapipe as mp
-import numpy as np
-
-# Helper function to calculate angle
-def calculate_angle(a, b, c):
-    a = np.array(a) # First
-    b = np.array(b) # Mid
-    c = np.array(c) # End
-    
-    radians = np.arctan2(c[1]-b[1], c[0]-b[0]) - np.arctan2(a[1]-b[1], a[0]-b[0])
-    angle = np.abs(radians*180.0/np.pi)
-    
-    if angle > 180.0:
-        angle = 360 - angle
-        
-    return angle
+import dataclasses
+import time
+import angles
+import events
+import exercises
 
 # Initialize MediaPipe tools
 mp_drawing = mp.solutions.drawing_utils
 mp_pose = mp.solutions.pose
 
-# Start webcam capture
-cap = cv2.VideoCapture(0)
-
-# Setup variables for rep counting
-counter = 0 
-stage = None # Can be 'up' or 'down'
-
-with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
-    while cap.isOpened():
-        success, image = cap.read()
-        if not success:
-            break
-
-        # Convert the BGR image to RGB before processing.
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        image.flags.writeable = False
-      
-        # Make detection
-        results = pose.process(image)
-    
-        # Convert the image back to BGR.
-        image.flags.writeable = True
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-        
-        # Extract landmarks
+
+def make_spec(exercise):
+    spec = exercises.resolve(exercise)
+    if spec is None:
+        raise SystemExit(f"Can't track '{exercise}'. Known exercises: {', '.join(s.name for s in exercises.EXERCISES)}")
+    if spec.name == 'Bodyweight Squats':
+        # This view only needs the working leg, so it checks visibility of
+        # just those joints with a looser threshold.
+        spec = dataclasses.replace(spec, visible_joints=(angles.LEFT_HIP, angles.LEFT_KNEE, angles.LEFT_ANKLE), min_visibility=0.5)
+    return spec
+
+
+def publish_changes(hub, tracker, before, has_pose, had_pose):
+    """
+    Publishes what changed in the tracker since `before` (counter, stage, feedback, whole seconds held).
+    """
+    counter, stage, feedback, held = before
+    if has_pose != had_pose:
+        hub.publish('pose', visible=has_pose)
+    if tracker.stage != stage:
+        hub.publish('stage', stage=tracker.stage)
+    if tracker.counter != counter:
+        hub.publish('rep', count=tracker.counter, exercise=tracker.spec.name)
+    if tracker.feedback != feedback:
+        hub.publish('feedback', text=tracker.feedback, kind=tracker.feedback_type)
+    if int(tracker.elapsed_time) != held:
+        hub.publish('hold', seconds=int(tracker.elapsed_time), exercise=tracker.spec.name)
+
+
+def state(tracker):
+    return tracker.counter, tracker.stage, tracker.feedback, int(tracker.elapsed_time)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count reps from a webcam or video, optionally publishing events over a socket.")
+    parser.add_argument('--source', default='0', help="Camera index or video file")
+    parser.add_argument('--exercise', default='Bodyweight Squats', help="Exercise to track")
+    parser.add_argument('--serve', nargs='?', const=events.DEFAULT_ADDRESS, help=f"Publish events on host:port or unix:///path (default {events.DEFAULT_ADDRESS})")
+    parser.add_argument('--headless', action='store_true', help="Don't open a preview window")
+    parser.add_argument('--model-complexity', type=int, default=1, choices=(0, 1, 2))
+    args = parser.parse_args()
+
+    # Start webcam capture
+    cap = cv2.VideoCapture(int(args.source) if args.source.isdigit() else args.source)
+
+    # Setup the shared exercise state machine
+    tracker = exercises.ExerciseTracker(make_spec(args.exercise))
+    hub = events.EventHub(args.serve, hello={'type': 'hello', 'exercise': tracker.spec.name}) if args.serve else None
+    if hub is not None:
         try:
-            landmarks = results.pose_landmarks.landmark
-            
-            # Check if the required landmarks are clearly visible
-            hip_visibility = landmarks[mp_pose.PoseLandmark.LEFT_HIP.value].visibility
-            knee_visibility = landmarks[mp_pose.PoseLandmark.LEFT_KNEE.value].visibility
-            ankle_visibility = landmarks[mp_pose.PoseLandmark.LEFT_ANKLE.value].visibility
-
-            if hip_visibility > 0.5 and knee_visibility > 0.5 and ankle_visibility > 0.5:
-                # Get coordinates
-                hip = [landmarks[mp_pose.PoseLandmark.LEFT_HIP.value].x, landmarks[mp_pose.PoseLandmark.LEFT_HIP.value].y]
-                knee = [landmarks[mp_pose.PoseLandmark.LEFT_KNEE.value].x, landmarks[mp_pose.PoseLandmark.LEFT_KNEE.value].y]
-                ankle = [landmarks[mp_pose.PoseLandmark.LEFT_ANKLE.value].x, landmarks[mp_pose.PoseLandmark.LEFT_ANKLE.value].y]
-                
-                # Calculate angle
-                angle = calculate_angle(hip, knee, ankle)
-                
-                # Rep counting logic
-                if angle > 160:
-                    stage = "up"
-                if angle < 90 and stage =='up':
-                    stage = "down"
-                    counter += 1
-                    print(f"Rep Count: {counter}")
-                       
-        except:
-            pass # Do nothing if landmarks are not detected
-        
-        # Display Rep Count
-        # --- FIX WAS HERE ---
-        cv2.putText(image, 'REPS', (15,12), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,0,0), 1, cv2.LINE_AA)
-        cv2.putText(image, str(counter), (10,60), cv2.FONT_HERSHEY_SIMPLEX, 2, (255,255,255), 2, cv2.LINE_AA)
-        
-        # Draw the pose annotation on the image
-        if results.pose_landmarks:
-            mp_drawing.draw_landmarks(image, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)                        
-
-        # Display the resulting frame
-        cv2.imshow('GYM BRO - Rep Counter', image)
-
-        # Exit by pressing 'q'
-        if cv2.waitKey(10) & 0xFF == ord('q'):
-            break
-
-cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+            hub.start()
+        except OSError as e:
+            cap.release()
+            raise SystemExit(f"Can't publish events on {args.serve}: {e}")
+    had_pose = False
+
+    try:
+        with mp_pose.Pose(model_complexity=args.model_complexity, min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
+            while cap.isOpened():
+                success, image = cap.read()
+                if not success:
+                    break
+
+                # Convert the BGR image to RGB before processing.
+                image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+                image.flags.writeable = False
+
+                # Make detection
+                results = pose.process(image)
+
+                # Extract landmarks and run the rep counting logic
+                before = state(tracker)
+                has_pose = results.pose_landmarks is not None
+                if has_pose:
+                    tracker.update(results.pose_landmarks.landmark, time.perf_counter())
+                    if tracker.counter != before[0]:
+                        print(f"Rep Count: {tracker.counter}")
+                else:
+                    tracker.lost()
+                if hub is not None:
+                    publish_changes(hub, tracker, before, has_pose, had_pose)
+                had_pose = has_pose
+
+                if args.headless:
+                    continue
+
+                # Convert the image back to BGR.
+                image.flags.writeable = True
+                image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+
+                # Display Rep Count
+                cv2.putText(image, 'REPS', (15,12), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,0,0), 1, cv2.LINE_AA)
+                cv2.putText(image, str(tracker.counter), (10,60), cv2.FONT_HERSHEY_SIMPLEX, 2, (255,255,255), 2, cv2.LINE_AA)
+
+                # Draw the pose annotation on the image
+                if has_pose:
+                    mp_drawing.draw_landmarks(image, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
+
+                # Display the resulting frame
+                cv2.imshow('GYM BRO - Rep Counter', image)
+
+                # Exit by pressing 'q'
+                if cv2.waitKey(10) & 0xFF == ord('q'):
+                    break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cap.release()
+        if hub is not None:
+            hub.close()
+        if not args.headless:
+            cv2.destroyAllWindows()
+
+
+if __name__ == '__main__':
+    main()
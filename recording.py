@@ -0,0 +1,169 @@
+"""
+Compact landmark recordings and zero-copy replay.
+
+A recording is a 16-byte header followed by fixed-size records, one per
+processed frame:
+
+    t          float64    capture time (seconds since the epoch)
+    exercise   uint16     1-based index into exercises.EXERCISES, 0 if unknown
+    flags      uint16     HAS_POSE when a pose was detected
+    landmarks  float32    (33, 4) x, y, z, visibility (NaN without a pose)
+
+That is 544 bytes per frame, roughly 16 KB per second at 30 fps. Replay maps
+the file straight into NumPy with np.memmap, so hours of sessions can be fed
+back through the rep-counting logic without decoding video or running
+MediaPipe again.
+
+Usage:
+    python recording.py recordings/session.gblm
+"""
+import argparse
+import os
+import struct
+
+import numpy as np
+
+import angles
+import exercises
+
+MAGIC = b'GBLM'
+VERSION = 1
+EXTENSION = '.gblm'
+HAS_POSE = 1
+
+_HEADER = struct.Struct('<4sHHII')  # magic, version, landmarks per frame, record size, reserved
+HEADER_SIZE = _HEADER.size
+
+RECORD_DTYPE = np.dtype([
+    ('t', '<f8'),
+    ('exercise', '<u2'),
+    ('flags', '<u2'),
+    ('reserved', '<u4'),
+    ('landmarks', '<f4', (angles.NUM_LANDMARKS, 4)),
+])
+
+
+def exercise_id(spec) -> int:
+    return exercises.EXERCISES.index(spec) + 1 if spec is not None else 0
+
+
+def _check_header(header: bytes, path):
+    magic, version, num_landmarks, record_size, _ = _HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} landmark recording.")
+    if num_landmarks != angles.NUM_LANDMARKS or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} has an unexpected record layout.")
+
+
+class LandmarkRecorder:
+    """
+    Appends one record per frame. Reopening an existing file continues it.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._file = open(path, 'a+b')
+        self._file.seek(0, os.SEEK_END)
+        if self._file.tell() == 0:
+            self._file.write(_HEADER.pack(MAGIC, VERSION, angles.NUM_LANDMARKS, RECORD_DTYPE.itemsize, 0))
+        else:
+            self._file.seek(0)
+            _check_header(self._file.read(HEADER_SIZE), path)
+            # Drop a partial record left behind by a crash so the stride stays intact
+            size = self._file.seek(0, os.SEEK_END)
+            whole = HEADER_SIZE + (size - HEADER_SIZE) // RECORD_DTYPE.itemsize * RECORD_DTYPE.itemsize
+            if whole != size:
+                self._file.truncate(whole)
+                self._file.seek(whole)
+        self._record = np.zeros(1, dtype=RECORD_DTYPE)
+        self.frames = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def append(self, t: float, exercise: int, pts=None):
+        """
+        `pts` is a (33, 4) array, a frame of landmark objects, or None without a pose.
+        """
+        record = self._record[0]
+        record['t'] = t
+        record['exercise'] = exercise
+        if pts is None:
+            record['flags'] = 0
+            record['landmarks'] = np.nan
+        else:
+            record['flags'] = HAS_POSE
+            record['landmarks'] = pts if isinstance(pts, np.ndarray) else angles.landmarks_to_array(pts)
+        self._file.write(self._record.tobytes())
+        self.frames += 1
+
+    def close(self):
+        self._file.close()
+
+
+def load(path) -> np.memmap:
+    """
+    Memory-maps a recording as a read-only structured array of RECORD_DTYPE.
+    Fields such as records['landmarks'] are views into the file, not copies.
+    """
+    with open(path, 'rb') as f:
+        _check_header(f.read(HEADER_SIZE), path)
+    count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+
+
+def segments(records):
+    """
+    Splits records into runs of the same exercise: yields (spec or None, records slice).
+    """
+    ids = records['exercise']
+    if len(ids) == 0:
+        return
+    bounds = np.flatnonzero(np.diff(ids)) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(ids)]))
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        exercise = int(ids[start])
+        spec = exercises.EXERCISES[exercise - 1] if exercise else None
+        yield spec, records[start:end]
+
+
+def replay(path) -> list:
+    """
+    Re-runs rep counting over a recording in place of pose.process.
+    Returns one summary per exercise segment.
+    """
+    summaries = []
+    for spec, records in segments(load(path)):
+        if spec is None:
+            continue
+        tracker = exercises.ExerciseTracker(spec).run(records['t'].tolist(), records['landmarks'])
+        summaries.append({
+            'exercise': spec.name,
+            'frames': len(records),
+            'duration_s': round(float(records['t'][-1] - records['t'][0]), 2),
+            'reps': tracker.counter,
+            'hold_seconds': round(tracker.elapsed_time, 2),
+        })
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay landmark recordings through the rep counter.")
+    parser.add_argument('paths', nargs='+', help="Recording files (.gblm)")
+    args = parser.parse_args()
+    for path in args.paths:
+        for summary in replay(path):
+            print(f"{os.path.basename(path)}: {summary['exercise']} - {summary['reps']} reps, "
+                  f"{summary['hold_seconds']}s hold over {summary['frames']} frames")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Bandwidth-aware rendering for the Streamlit workout page.
+
+Every st.image call ships a frame over the websocket and makes the browser
+redraw, so pushing full-resolution raw frames at the inference rate takes CPU
+away from pose tracking and leaves remote clients behind. FrameRenderer caps
+the display rate independently of inference, downscales frames and sends
+them as JPEG, nudging the quality up or down to stay within a bandwidth
+budget. TextSlot only re-sends a text widget when its content changes.
+"""
+import os
+import time
+
+import cv2
+
+from telemetry import METRICS
+
+DISPLAY_FPS = float(os.environ.get('GYMBRO_DISPLAY_FPS', 15))
+DISPLAY_WIDTH = int(os.environ.get('GYMBRO_DISPLAY_WIDTH', 640))
+DISPLAY_KBPS = int(os.environ.get('GYMBRO_DISPLAY_KBPS', 4000))
+
+
+class FrameRenderer:
+    def __init__(self, placeholder, max_fps=DISPLAY_FPS, max_width=DISPLAY_WIDTH, target_kbps=DISPLAY_KBPS,
+                 quality=80, min_quality=40, max_quality=90):
+        self.placeholder = placeholder
+        self.interval = 1.0 / max_fps
+        self.max_width = max_width
+        self.target_bytes = target_kbps * 1000 / 8 / max_fps
+        self.quality = quality
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.skipped = 0
+        self._last = 0.0
+
+    def due(self, now=None) -> bool:
+        """
+        True when enough time has passed since the last displayed frame.
+        Frames that aren't due are counted as skipped.
+        """
+        now = time.perf_counter() if now is None else now
+        if now - self._last < self.interval:
+            self.skipped += 1
+            return False
+        self._last = now
+        return True
+
+    def render(self, image):
+        """
+        Downscales and JPEG-encodes a BGR frame, then pushes it to the placeholder.
+        """
+        height, width = image.shape[:2]
+        if width > self.max_width:
+            image = cv2.resize(image, (self.max_width, round(height * self.max_width / width)), interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return
+        self.placeholder.image(encoded.tobytes())
+        self._adapt(len(encoded))
+
+    def _adapt(self, size):
+        if size > self.target_bytes * 1.1 and self.quality > self.min_quality:
+            self.quality = max(self.min_quality, self.quality - 5)
+        elif size < self.target_bytes * 0.7 and self.quality < self.max_quality:
+            self.quality = min(self.max_quality, self.quality + 1)
+        METRICS.gauge('render.jpeg_quality', self.quality)
+        METRICS.gauge('render.kb_per_frame', round(size / 1000, 1))
+        METRICS.gauge('frames.render_skipped', self.skipped)
+
+
+class TextSlot:
+    """
+    Wraps an st.empty() placeholder and only redraws it when the text or the
+    element type (subheader, success, warning, ...) changes.
+    """
+    __slots__ = ('placeholder', 'shown')
+
+    def __init__(self, placeholder):
+        self.placeholder = placeholder
+        self.shown = None
+
+    def show(self, kind, text) -> bool:
+        if (kind, text) == self.shown:
+            return False
+        getattr(self.placeholder, kind)(text)
+        self.shown = (kind, text)
+        return True
@@ -0,0 +1,161 @@
+"""
+Process-lifetime camera and pose-model resources.
+
+Streamlit reruns the script for every set, and opening the camera plus
+building and warming up a MediaPipe graph costs seconds each time. These
+resources live in module globals, so they survive reruns and are shared by
+every session in the process. Each one is reference counted: it is created
+and warmed up on first use, and closed only after it has been unused for
+`idle_timeout` seconds, which comfortably covers the rest between sets.
+
+Use `lease()` as a context manager; the object it yields is safe to share
+between threads because reads and inference are serialized with a lock.
+"""
+import threading
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+CAMERA_IDLE_TIMEOUT = 60
+POSE_IDLE_TIMEOUT = 600
+
+
+class SharedResource:
+    def __init__(self, name, factory, closer, idle_timeout):
+        self.name = name
+        self.factory = factory
+        self.closer = closer
+        self.idle_timeout = idle_timeout
+        self.refs = 0
+        self._value = None
+        self._lock = threading.Lock()
+        self._idle_timer = None
+
+    def acquire(self):
+        with self._lock:
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            if self._value is None:
+                self._value = self.factory()
+            self.refs += 1
+            return self._value
+
+    def release(self):
+        with self._lock:
+            self.refs -= 1
+            if self.refs == 0 and self._value is not None:
+                self._idle_timer = threading.Timer(self.idle_timeout, self._close_if_idle)
+                self._idle_timer.daemon = True
+                self._idle_timer.start()
+
+    @contextmanager
+    def lease(self):
+        value = self.acquire()
+        try:
+            yield value
+        finally:
+            self.release()
+
+    def prewarm(self):
+        """
+        Creates the resource in the background so the next lease is instant.
+        """
+        def warm():
+            try:
+                self.acquire()
+                self.release()
+            except Exception as e:
+                print(f"Could not prewarm {self.name}: {e}")
+        threading.Thread(target=warm, name=f"gymbro-prewarm-{self.name}", daemon=True).start()
+
+    def _close_if_idle(self):
+        with self._lock:
+            if self.refs == 0 and self._value is not None:
+                value, self._value, self._idle_timer = self._value, None, None
+                self.closer(value)
+
+
+class SharedCapture:
+    """
+    cv2.VideoCapture wrapper whose reads are serialized across threads.
+    """
+
+    def __init__(self, index, warmup_frames=5):
+        self._cap = cv2.VideoCapture(index)
+        self._lock = threading.Lock()
+        for _ in range(warmup_frames):  # let exposure and white balance settle
+            self._cap.read()
+
+    def isOpened(self):
+        return self._cap.isOpened()
+
+    def read(self):
+        with self._lock:
+            return self._cap.read()
+
+    def get(self, prop):
+        return self._cap.get(prop)
+
+    def release(self):
+        with self._lock:
+            self._cap.release()
+
+
+class SharedPose:
+    """
+    Pose model wrapper that serializes process() and is warmed up on creation.
+    Usable as a context manager that does nothing, like a leased object.
+    """
+
+    def __init__(self, pose, warmup_shape=(480, 640, 3)):
+        self._pose = pose
+        self._lock = threading.Lock()
+        blank = np.zeros(warmup_shape, dtype=np.uint8)
+        for _ in range(2):
+            pose.process(blank)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def process(self, image):
+        with self._lock:
+            return self._pose.process(image)
+
+    def close(self):
+        with self._lock:
+            self._pose.close()
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _get(key, factory, closer, idle_timeout):
+    with _registry_lock:
+        resource = _registry.get(key)
+        if resource is None:
+            resource = _registry[key] = SharedResource(str(key), factory, closer, idle_timeout)
+        return resource
+
+
+def camera(index=0) -> SharedResource:
+    def open_camera():
+        cap = SharedCapture(index)
+        if not cap.isOpened():
+            cap.release()
+            raise RuntimeError(f"Could not open camera {index}.")
+        return cap
+    return _get(('camera', index), open_camera, lambda cap: cap.release(), CAMERA_IDLE_TIMEOUT)
+
+
+def pose(key, pose_factory) -> SharedResource:
+    """
+    Shared pose model for `key`; `pose_factory()` builds the underlying model
+    (an mp_pose.Pose or anything with the same interface) the first time.
+    """
+    return _get(('pose', key), lambda: SharedPose(pose_factory()), lambda model: model.close(), POSE_IDLE_TIMEOUT)
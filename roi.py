@@ -0,0 +1,255 @@
+"""
+ROI-tracking, resolution-adaptive pose inference.
+
+Most of each camera frame is background. RoiPoseEstimator crops a padded box
+around the previous frame's landmarks, downscales it to a small inference size
+and maps the resulting landmarks back to full-frame coordinates, so everything
+downstream is unchanged. When tracking is lost it searches the full frame
+again with a separate static-image Pose, and the tracking graphs start over
+with the new track, so MediaPipe's temporal state never mixes crops of
+different geometry with full frames. ComplexityGovernor picks MediaPipe's model_complexity from the measured
+per-frame latency so each device runs the most accurate model it can afford,
+among the models that are already installed.
+
+RoiPoseEstimator has the same process()/close()/context-manager interface as
+mp_pose.Pose, so it can be used anywhere a Pose is.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+import angles
+from telemetry import METRICS
+
+FRAME_BUDGET_S = float(os.environ.get('GYMBRO_FRAME_BUDGET_MS', 66)) / 1000
+
+# Torso and legs must be tracked confidently for the crop to be trusted
+TRACKING_JOINTS = (angles.LEFT_SHOULDER, angles.RIGHT_SHOULDER, angles.LEFT_HIP, angles.RIGHT_HIP, angles.LEFT_KNEE, angles.RIGHT_KNEE)
+
+# Landmark model MediaPipe loads for each model_complexity; only 'full' ships with the wheel
+POSE_MODELS = {0: 'pose_landmark_lite.tflite', 1: 'pose_landmark_full.tflite', 2: 'pose_landmark_heavy.tflite'}
+
+
+def installed_complexities():
+    """
+    Complexities whose landmark model is already on disk. MediaPipe downloads
+    the others on first use, which blocks a frame and fails offline.
+    """
+    try:
+        import mediapipe
+    except ImportError:
+        return (1,)
+    folder = os.path.join(os.path.dirname(mediapipe.__file__), 'modules', 'pose_landmark')
+    return tuple(c for c, name in sorted(POSE_MODELS.items()) if os.path.exists(os.path.join(folder, name))) or (1,)
+
+
+def _close_built(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class ComplexityGovernor:
+    """
+    Steps model_complexity down when inference is over budget and back up when
+    there is plenty of headroom, waiting `cooldown` frames between changes.
+    `lowest` and `highest` default to the range of installed_complexities().
+    """
+
+    def __init__(self, budget_s=FRAME_BUDGET_S, complexity=1, lowest=None, highest=None, cooldown=45, smoothing=0.1):
+        if lowest is None or highest is None:
+            installed = installed_complexities()
+            lowest = installed[0] if lowest is None else lowest
+            highest = installed[-1] if highest is None else highest
+        self.budget_s = budget_s
+        self.complexity = min(max(complexity, lowest), highest)
+        self.lowest = lowest
+        self.highest = highest
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+        self.latency = 0.0
+        self._frames_since_change = 0
+
+    def observe(self, seconds) -> bool:
+        """
+        Records one inference latency. Returns True if the complexity changed.
+        """
+        self.latency = seconds if self.latency == 0.0 else self.latency + self.smoothing * (seconds - self.latency)
+        self._frames_since_change += 1
+        if self._frames_since_change < self.cooldown:
+            return False
+        if self.latency > self.budget_s * 1.15 and self.complexity > self.lowest:
+            self.complexity -= 1
+        elif self.latency < self.budget_s * 0.5 and self.complexity < self.highest:
+            self.complexity += 1
+        else:
+            return False
+        self._frames_since_change = 0
+        self.latency = 0.0
+        return True
+
+    def pin(self, complexity):
+        """
+        Stays at `complexity` from now on, e.g. after another one failed to load.
+        """
+        self.complexity = self.lowest = self.highest = complexity
+        self.latency = 0.0
+
+
+class RoiPoseEstimator:
+    def __init__(self, pose_factory, target_size=256, search_size=480, padding=0.3, min_visibility=0.5, governor=None):
+        """
+        `pose_factory(model_complexity, static_image_mode)` must return a new mp_pose.Pose.
+        """
+        self.pose_factory = pose_factory
+        self.target_size = target_size
+        self.search_size = search_size
+        self.padding = padding
+        self.min_visibility = min_visibility
+        self.governor = governor or ComplexityGovernor()
+        self._poses = {}  # (complexity, kind) -> graph; kind is 'crop', 'frame' or 'search'
+        self._roi = None  # (x0, y0, x1, y1) in pixels, or None for a full-frame search
+        self._build_s = 0.0  # graph construction time to leave out of the measured latency
+        self._working = self.governor.complexity  # last complexity whose graph built successfully
+        self._tracking_key = None  # tracking graph that has followed the current track
+        self._spares = {}  # key -> Future of a fresh tracking graph, built off the frame path
+        self._builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gymbro-pose-build')
+        self.full_frame_searches = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        for pose in self._poses.values():
+            pose.close()
+        self._poses.clear()
+        for spare in self._spares.values():
+            spare.add_done_callback(_close_built)
+        self._spares.clear()
+        self._builder.shutdown(wait=False)
+
+    def _pose(self, kind):
+        """
+        The graph for `kind` at the current complexity, built on first use.
+        Graphs are kept per complexity, so switching back is free.
+        """
+        key = (self.governor.complexity, kind)
+        pose = self._poses.get(key)
+        if pose is None:
+            started = time.perf_counter()
+            try:
+                pose = self._poses[key] = self.pose_factory(key[0], kind == 'search')
+            except Exception as e:
+                if key[0] == self._working:
+                    raise
+                print(f"Could not load the complexity {key[0]} pose model, staying at {self._working}: {e}")
+                self.governor.pin(self._working)
+                METRICS.gauge('pose.complexity', self._working)
+                return self._pose(kind)
+            finally:
+                elapsed = time.perf_counter() - started
+                self._build_s += elapsed
+                METRICS.record('pose.build', elapsed)
+            self._working = key[0]
+            if kind != 'search':
+                self._build_spare(key)
+        elif kind != 'search' and key != self._tracking_key:
+            pose = self._swap_in_spare(key)
+        if kind != 'search':
+            self._tracking_key = key
+        return pose
+
+    def _build_spare(self, key):
+        self._spares[key] = self._builder.submit(self.pose_factory, key[0], False)
+
+    def _swap_in_spare(self, key):
+        """
+        The graph for `key` followed an earlier track. Swaps in its spare, a
+        fresh graph built in the background, and starts the next spare. If the
+        spare isn't ready the old graph is kept; MediaPipe re-detects by itself
+        when the old track doesn't match.
+        """
+        spare = self._spares.get(key)
+        if spare is None or spare.done():
+            if spare is not None and spare.exception() is None:
+                stale, self._poses[key] = self._poses[key], spare.result()
+                self._builder.submit(stale.close)
+            self._build_spare(key)
+        return self._poses[key]
+
+    def process(self, image):
+        """
+        Runs pose estimation on an RGB frame; landmarks come back in full-frame
+        normalized coordinates.
+        """
+        started = time.perf_counter()
+        self._build_s = 0.0
+        height, width = image.shape[:2]
+        full_frame = (0, 0, width, height)
+        results = None
+        if self._roi is not None:
+            kind = 'frame' if self._roi == full_frame else 'crop'
+            results = self._process_crop(image, self._roi, self.target_size if kind == 'crop' else self.search_size, kind)
+            if not self._tracking(results):
+                results = None  # lost the person
+        searched = results is None
+        if searched:
+            self.full_frame_searches += 1
+            results = self._process_crop(image, full_frame, self.search_size, 'search')
+        self._roi = self._next_roi(results, width, height) if self._tracking(results) else None
+        if searched and self._roi is not None:
+            self._tracking_key = None  # a new track; don't let the old one's state steer it
+
+        if self.governor.observe(time.perf_counter() - started - self._build_s):
+            METRICS.gauge('pose.complexity', self.governor.complexity)
+        METRICS.gauge('pose.full_frame_searches', self.full_frame_searches)
+        return results
+
+    def _tracking(self, results):
+        if results is None or results.pose_landmarks is None:
+            return False
+        landmarks = results.pose_landmarks.landmark
+        return all(landmarks[i].visibility > self.min_visibility for i in TRACKING_JOINTS)
+
+    def _process_crop(self, image, roi, size, kind):
+        height, width = image.shape[:2]
+        x0, y0, x1, y1 = roi
+        crop = image[y0:y1, x0:x1]
+        crop_w, crop_h = x1 - x0, y1 - y0
+        scale = size / max(crop_w, crop_h)
+        if scale < 1.0:
+            crop = cv2.resize(crop, (max(1, round(crop_w * scale)), max(1, round(crop_h * scale))), interpolation=cv2.INTER_AREA)
+        else:
+            crop = np.ascontiguousarray(crop)
+        crop.flags.writeable = False
+        results = self._pose(kind).process(crop)
+        if results.pose_landmarks is not None and roi != (0, 0, width, height):
+            for lm in results.pose_landmarks.landmark:
+                lm.x = (x0 + lm.x * crop_w) / width
+                lm.y = (y0 + lm.y * crop_h) / height
+                lm.z = lm.z * crop_w / width
+        return results
+
+    def _next_roi(self, results, width, height):
+        """
+        Padded square box around the visible landmarks, clamped to the frame.
+        """
+        points = np.array([(lm.x, lm.y) for lm in results.pose_landmarks.landmark if lm.visibility > self.min_visibility])
+        if len(points) == 0:
+            return None
+        (min_x, min_y), (max_x, max_y) = points.min(axis=0) * (width, height), points.max(axis=0) * (width, height)
+        side = max(max_x - min_x, max_y - min_y) * (1 + 2 * self.padding)
+        cx, cy = (min_x + max_x) / 2, (min_y + max_y) / 2
+        x0, y0 = max(0, int(cx - side / 2)), max(0, int(cy - side / 2))
+        x1, y1 = min(width, int(cx + side / 2)), min(height, int(cy + side / 2))
+        if x1 - x0 < 32 or y1 - y0 < 32:
+            return None
+        if (x1 - x0) * (y1 - y0) > 0.8 * width * height:
+            return (0, 0, width, height)  # the person fills the frame; cropping wouldn't save anything
+        return (x0, y0, x1, y1)
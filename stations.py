@@ -0,0 +1,293 @@
+"""
+Multi-station mode: one worker process per camera, shared-memory handoff.
+
+The Streamlit script runs on one GIL-bound thread, so a single box could only
+coach one person. StationSupervisor starts one process per camera index or
+video source, each with its own MediaPipe Pose and ExerciseTracker. Workers
+publish display frames and status (reps, stage, feedback, landmarks, fps)
+into shared-memory rings, and the dashboard copies the newest slot straight
+out of shared memory; nothing is pickled per frame.
+
+Ring protocol (one writer, any number of readers): the writer fills slot
+`seq % slots`, then stores `seq` in the header. A reader copies the newest
+slot and re-checks the header, retrying if the writer lapped it mid-copy.
+
+A camera worker that dies is respawned with growing delays, carrying over
+the last published reps and hold time; one that keeps dying right after
+starting is given up on and reported as unavailable.
+"""
+import atexit
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+import angles
+import exercises
+import pipeline
+
+FRAME_SHAPE = (270, 480, 3)  # display resolution; inference still sees the full camera frame
+SLOTS = 4
+RESTART_DELAY = 1.0       # seconds before the first respawn, doubled after each quick failure
+MAX_RESTART_DELAY = 30.0
+MAX_RESTARTS = 5          # quick failures in a row before a camera is reported unavailable
+STABLE_AFTER = 10.0       # a worker that ran this long resets the failure count
+
+STATUS_DTYPE = np.dtype([
+    ('alive', 'u1'),
+    ('has_pose', 'u1'),
+    ('reps', '<i4'),
+    ('elapsed', '<f4'),
+    ('fps', '<f4'),
+    ('stage', 'S8'),
+    ('feedback_type', 'S8'),
+    ('feedback', 'S96'),
+    ('landmarks', '<f4', (angles.NUM_LANDMARKS, 4)),
+])
+
+
+def parse_sources(text):
+    """
+    "0, 1, videos/a.mp4" -> [0, 1, 'videos/a.mp4']; digits are camera indices.
+    """
+    return [int(s) if s.isdigit() else s for s in (s.strip() for s in text.split(',')) if s]
+
+
+class SharedRing:
+    """
+    Ring of `slots` numpy items of `dtype` and `shape` in one shared-memory
+    block, preceded by the sequence number of the newest published item.
+    Created when `name` is None, attached to otherwise.
+    """
+
+    def __init__(self, dtype, shape=(), slots=SLOTS, name=None):
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.owner = name is None
+        item_bytes = int(np.prod(self.shape, dtype=np.int64)) * self.dtype.itemsize
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=8 + item_bytes * slots)
+        self._seq = np.ndarray((1,), dtype='<i8', buffer=self.shm.buf)
+        self._items = np.ndarray((slots, *self.shape), dtype=self.dtype, buffer=self.shm.buf, offset=8)
+        if self.owner:
+            self._seq[0] = -1
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def seq(self) -> int:
+        return int(self._seq[0])
+
+    def slot(self, seq):
+        """
+        Writable view of the slot for `seq`; fill it, then publish(seq).
+        """
+        return self._items[seq % self.slots, ...]
+
+    def publish(self, seq):
+        self._seq[0] = seq
+
+    def read(self, out=None):
+        """
+        Copies the newest item and returns (seq, item), or (-1, None) before the first publish.
+        """
+        if out is None:
+            out = np.empty(self.shape, dtype=self.dtype)
+        while True:
+            seq = self.seq
+            if seq < 0:
+                return -1, None
+            np.copyto(out, self._items[seq % self.slots])
+            # The writer may already be filling seq + 1; only a lap onto our slot corrupts the copy
+            if self.seq - seq < self.slots - 1:
+                return seq, out if self.shape else out[()]
+
+    def close(self):
+        self._seq = self._items = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _set_text(record, field, text):
+    record[field] = text.encode('utf-8')[:record.dtype[field].itemsize]
+
+
+def _station_worker(source, exercise, frame_ring, status_ring, stop, reps=0, elapsed=0.0):
+    import mediapipe as mp
+    frames = SharedRing(np.uint8, FRAME_SHAPE, name=frame_ring)
+    statuses = SharedRing(STATUS_DTYPE, name=status_ring)
+    spec = exercises.resolve(exercise)
+    tracker = exercises.ExerciseTracker(spec, counter=reps, elapsed_time=elapsed) if spec else None
+    cap = cv2.VideoCapture(source)
+    # Continue after a previous worker's sequence numbers so readers never see it go backwards
+    seq = max(frames.seq, statuses.seq) + 1
+    fps = 0.0
+    last = time.perf_counter()
+    try:
+        with mp.solutions.pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
+            while not stop.is_set() and cap.isOpened():
+                success, frame = cap.read()
+                if not success: break
+                image, results = pipeline._infer(pose, frame)
+                now = time.perf_counter()
+
+                landmarks = None if results.pose_landmarks is None else results.pose_landmarks.landmark
+                if tracker is not None:
+                    if landmarks is None:
+                        tracker.lost()
+                    else:
+                        tracker.update(landmarks, now)
+
+                # Resize straight into the shared slot
+                cv2.resize(image, FRAME_SHAPE[1::-1], dst=frames.slot(seq), interpolation=cv2.INTER_AREA)
+                frames.publish(seq)
+
+                rate = 1.0 / max(now - last, 1e-6)
+                fps = rate if fps == 0.0 else fps + 0.1 * (rate - fps)
+                last = now
+                status = statuses.slot(seq)
+                status['alive'] = 1
+                status['has_pose'] = landmarks is not None
+                status['fps'] = fps
+                if landmarks is None:
+                    status['landmarks'] = np.nan
+                else:
+                    angles.landmarks_to_array(landmarks, out=status['landmarks'])
+                if tracker is not None:
+                    status['reps'] = tracker.counter
+                    status['elapsed'] = tracker.elapsed_time
+                    _set_text(status, 'stage', tracker.stage or '')
+                    _set_text(status, 'feedback_type', tracker.feedback_type)
+                    _set_text(status, 'feedback', tracker.feedback)
+                statuses.publish(seq)
+                seq += 1
+    finally:
+        cap.release()
+        # The slot for `seq` still holds the record from seq - SLOTS; start from the last one published
+        status = statuses.slot(seq)
+        if statuses.seq >= 0:
+            np.copyto(status, statuses.slot(statuses.seq))
+        else:
+            status['has_pose'] = 0
+            status['landmarks'] = np.nan
+        if tracker is not None:
+            status['reps'] = tracker.counter
+            status['elapsed'] = tracker.elapsed_time
+        status['alive'] = 0
+        statuses.publish(seq)
+        frames.close()
+        statuses.close()
+
+
+class StationSupervisor:
+    """
+    Owns the shared memory and one worker process per source. Sources are
+    camera indices or video paths / stream URLs. Crashed camera workers are
+    respawned by restart_dead() with backoff; finished videos are left alone.
+    """
+
+    def __init__(self, sources, exercise='Bodyweight Squats'):
+        self.sources = list(sources)
+        self.exercise = exercise
+        self._ctx = multiprocessing.get_context('spawn')  # MediaPipe and OpenCV state doesn't survive fork
+        self._stop = self._ctx.Event()
+        self.frame_rings = [SharedRing(np.uint8, FRAME_SHAPE) for _ in self.sources]
+        self.status_rings = [SharedRing(STATUS_DTYPE) for _ in self.sources]
+        self._processes = [None] * len(self.sources)
+        self._started_at = [0.0] * len(self.sources)
+        self._failures = [0] * len(self.sources)
+        self._retry_at = [None] * len(self.sources)
+        self._closed = False
+        atexit.register(self.stop)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def __len__(self):
+        return len(self.sources)
+
+    def _spawn(self, i):
+        # Resume from the last published status so a respawned station keeps its count
+        status = self.status(i)
+        reps, elapsed = (0, 0.0) if status is None else (int(status['reps']), float(status['elapsed']))
+        process = self._ctx.Process(
+            target=_station_worker, name=f"gymbro-station-{i}", daemon=True,
+            args=(self.sources[i], self.exercise, self.frame_rings[i].name, self.status_rings[i].name, self._stop, reps, elapsed))
+        process.start()
+        self._processes[i] = process
+        self._started_at[i] = time.monotonic()
+        self._retry_at[i] = None
+
+    def start(self):
+        for i in range(len(self.sources)):
+            self._spawn(i)
+
+    def restart_dead(self):
+        """
+        Respawns dead camera workers once their backoff has passed. Cheap
+        enough to call on every dashboard refresh.
+        """
+        if self._stop.is_set():
+            return
+        now = time.monotonic()
+        for i, process in enumerate(self._processes):
+            if not isinstance(self.sources[i], int) or process is None or process.is_alive() or self.unavailable(i):
+                continue
+            if self._retry_at[i] is None:
+                # Just noticed the death: schedule the next attempt
+                if now - self._started_at[i] >= STABLE_AFTER:
+                    self._failures[i] = 0
+                self._failures[i] += 1
+                if self.unavailable(i):
+                    continue
+                self._retry_at[i] = now + min(RESTART_DELAY * 2 ** (self._failures[i] - 1), MAX_RESTART_DELAY)
+            if now >= self._retry_at[i]:
+                self._spawn(i)
+
+    def unavailable(self, i) -> bool:
+        """
+        True once camera station `i` has failed MAX_RESTARTS times in a row and is no longer retried.
+        """
+        return self._failures[i] >= MAX_RESTARTS
+
+    def frame(self, i, out=None):
+        """
+        Newest BGR display frame of station `i`, or None before its first frame.
+        """
+        return self.frame_rings[i].read(out)[1]
+
+    def status(self, i):
+        """
+        Newest STATUS_DTYPE record of station `i`, or None before its first frame.
+        """
+        return self.status_rings[i].read()[1]
+
+    def stop(self):
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.stop)  # don't keep stopped supervisors alive until exit
+        self._stop.set()
+        for process in self._processes:
+            if process is not None:
+                process.join(timeout=3.0)
+                if process.is_alive():
+                    process.terminate()
+        for ring in self.frame_rings + self.status_rings:
+            ring.close()
+
+
+def max_stations():
+    # One core stays free for the UI process
+    return max(1, (os.cpu_count() or 2) - 1)
@@ -0,0 +1,195 @@
+"""
+Opt-in performance telemetry for the workout loop.
+
+Stages (capture, inference, rules, render, TTS, model calls) are timed with
+perf_counter_ns into rolling histograms, and counters track dropped/skipped
+frames and blocking calls made from the frame loop. The data can be drawn on
+the video as an overlay and is exported to a local JSON file so lag reports
+can be matched to a device.
+
+Telemetry is off by default and costs one attribute check per timed stage
+when disabled. Turn it on with GYMBRO_TELEMETRY=1 or from the sidebar.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+DEFAULT_EXPORT_PATH = os.environ.get('GYMBRO_TELEMETRY_FILE', 'metrics/telemetry.json')
+
+
+class Histogram:
+    """
+    Rolling window of the most recent durations, in seconds.
+    """
+    __slots__ = ('samples', 'total')
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.total = 0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.total += 1
+
+    def summary(self):
+        samples = np.fromiter(list(self.samples), dtype=float)
+        if not len(samples):
+            return {'count': self.total}
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1e3
+        return {
+            'count': self.total,
+            'mean_ms': round(samples.mean() * 1e3, 3),
+            'p50_ms': round(p50, 3),
+            'p95_ms': round(p95, 3),
+            'p99_ms': round(p99, 3),
+            'max_ms': round(samples.max() * 1e3, 3),
+        }
+
+
+class _Timer:
+    __slots__ = ('telemetry', 'name', 'blocking', 'start')
+
+    def __init__(self, telemetry, name, blocking):
+        self.telemetry = telemetry
+        self.name = name
+        self.blocking = blocking
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = (time.perf_counter_ns() - self.start) / 1e9
+        self.telemetry.record(self.name, seconds)
+        if self.blocking and seconds > self.telemetry.blocking_threshold:
+            self.telemetry.count(f"blocking.{self.name}")
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Telemetry:
+    def __init__(self, enabled=False, window=500, blocking_threshold=0.005, export_path=DEFAULT_EXPORT_PATH, export_interval=2.0):
+        self.enabled = enabled
+        self.window = window
+        self.blocking_threshold = blocking_threshold
+        self.export_path = export_path
+        self.export_interval = export_interval
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+        self._last_export = 0.0
+        self._started = time.time()
+
+    def stage(self, name, blocking=False):
+        """
+        Context manager that times a stage. With blocking=True, calls slower than
+        `blocking_threshold` are also counted as blocking the frame loop.
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, blocking)
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram(self.window))
+        histogram.add(seconds)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        if self.enabled:
+            self._gauges[name] = value
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+            self._started = time.time()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        return {
+            'timestamp': time.time(),
+            'uptime_s': round(time.time() - self._started, 1),
+            'stages': {name: histogram.summary() for name, histogram in sorted(histograms.items())},
+            'counters': counters,
+            'gauges': gauges,
+        }
+
+    def export(self, path=None):
+        path = path or self.export_path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def maybe_export(self):
+        """
+        Exports at most once per `export_interval`; cheap to call every frame.
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if now - self._last_export >= self.export_interval:
+            self._last_export = now
+            try:
+                self.export()
+            except OSError as e:
+                print(f"Could not write telemetry: {e}")
+
+    def overlay(self, image, stages=('frame', 'capture', 'inference', 'rules', 'render')):
+        """
+        Draws per-stage p50/p95 latency and the frame rate onto a BGR image in place.
+        """
+        import cv2
+        lines = []
+        frame = self._histograms.get('frame')
+        if frame is not None and frame.samples:
+            lines.append(f"{1.0 / (sum(frame.samples) / len(frame.samples)):.1f} fps")
+        for name in stages:
+            histogram = self._histograms.get(name)
+            if histogram is not None and histogram.samples:
+                p50, p95 = np.percentile(np.fromiter(list(histogram.samples), dtype=float), [50, 95]) * 1e3
+                lines.append(f"{name}: {p50:.1f} / {p95:.1f} ms")
+        lines.append(f"dropped frames: {self._gauges.get('frames.dropped', 0)}")
+        blocking = sum(v for k, v in self._counters.items() if k.startswith('blocking.'))
+        if blocking:
+            lines.append(f"blocking calls: {blocking}")
+        for i, line in enumerate(lines):
+            y = 20 + 18 * i
+            cv2.putText(image, line, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 3, cv2.LINE_AA)
+            cv2.putText(image, line, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1, cv2.LINE_AA)
+        return image
+
+
+# Process-wide instance shared by the app, the pipeline threads, TTS and the planner
+METRICS = Telemetry(enabled=os.environ.get('GYMBRO_TELEMETRY') == '1')